@@ -0,0 +1,257 @@
+"""
+Sound effect synthesis and playback on reserved mixer channels.
+
+The effects are sine tones synthesized in memory (SoundBank), optionally
+kept on disk as WAV files between runs.
+
+Each sound belongs to a category with its own channels, so a burst of move
+sounds can never take the channel a line clear or game over needs. When
+every channel of a category is busy the oldest voice is cut off for the
+new one (voice stealing), and a sound retriggered sooner than its rate
+limit is dropped instead of stacking up.
+
+The mixer buffer decides how long a triggered sound waits before it is
+mixed: 4096 samples is about 93 ms at 44.1 kHz, LOW_LATENCY_BUFFER about
+6 ms. `latency` measures that delay headless: it plays a few-sample probe
+and times how long the mixer takes to consume it, which is when the
+sound's first buffer is queued for the device.
+
+    python audio.py latency --buffer 4096 256 64
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import wave
+from array import array
+
+import pygame
+from pygame import mixer
+
+try:
+    import numpy as np
+except ImportError:  # Synthesis falls back to pure Python
+    np = None
+
+from controls import now_ms
+
+SAMPLE_RATE = 44100  # samples per second
+BITS_PER_SAMPLE = 16  # 16-bit audio
+NUM_CHANNELS = 1 # Mono audio
+AUDIO_BUFFER = 4096  # Samples per mixer buffer
+LOW_LATENCY_BUFFER = 256
+
+# Channels reserved per category and the category of each sound effect
+CATEGORY_CHANNELS = {
+    'movement': 2,
+    'impact': 2,
+    'event': 2,
+}
+SOUND_CATEGORIES = {
+    'move': 'movement',
+    'rotate': 'movement',
+    'drop': 'impact',
+    'clear': 'event',
+    'gameover': 'event',
+}
+# Minimum ms between two starts of the same sound
+RATE_LIMITS_MS = {
+    'move': 35,
+    'rotate': 35,
+    'drop': 20,
+}
+
+
+def init_mixer(buffer=AUDIO_BUFFER):
+    # pre_init too, so a later pygame.init() opens the mixer with these settings
+    mixer.pre_init(SAMPLE_RATE, -BITS_PER_SAMPLE, NUM_CHANNELS, buffer)
+    mixer.init(SAMPLE_RATE, -BITS_PER_SAMPLE, NUM_CHANNELS, buffer)
+
+
+class ChannelPool:
+    """Plays sound effects on per-category reserved channels with voice stealing and rate limits."""
+
+    def __init__(self, categories=CATEGORY_CHANNELS, sound_categories=SOUND_CATEGORIES,
+                 rate_limits=RATE_LIMITS_MS, clock=now_ms):
+        total = sum(categories.values())
+        mixer.set_num_channels(max(total, mixer.get_num_channels()))
+        mixer.set_reserved(total)  # Sound.play() elsewhere never lands on these
+        self.channels = {}
+        self.started = {}  # Per category: start time of the sound on each channel
+        first = 0
+        for category, count in categories.items():
+            self.channels[category] = [mixer.Channel(i) for i in range(first, first + count)]
+            self.started[category] = [0.0] * count
+            first += count
+        self.sound_categories = sound_categories
+        self.rate_limits = rate_limits
+        self.clock = clock
+        self.last_played = {}
+        self.counts = {'played': 0, 'stolen': 0, 'limited': 0}
+
+    def play(self, name, sound):
+        """Start `sound` as effect `name`; returns its channel, or None if rate limited."""
+        now = self.clock()
+        last = self.last_played.get(name)
+        if last is not None and now - last < self.rate_limits.get(name, 0):
+            self.counts['limited'] += 1
+            return None
+        category = self.sound_categories.get(name, 'event')
+        channels = self.channels[category]
+        started = self.started[category]
+        index = next((i for i, channel in enumerate(channels) if not channel.get_busy()), None)
+        if index is None:
+            index = started.index(min(started))  # Steal the oldest voice
+            self.counts['stolen'] += 1
+        channels[index].play(sound)
+        started[index] = now
+        self.last_played[name] = now
+        self.counts['played'] += 1
+        return channels[index]
+
+
+# --- Synthesis ---
+
+# Sound effects as (duration in seconds, frequency in Hz, amplitude)
+SOUND_EFFECTS = {
+    'clear': (0.1, 880, 0.5),     # A5 note
+    'drop': (0.05, 110, 0.5),     # A2 note
+    'gameover': (1.0, 55, 0.7),   # A1 note
+    'move': (0.05, 220, 0.5),     # A3 note
+    'rotate': (0.1, 440, 0.5),    # A4 note
+}
+
+
+def synthesize(duration, frequency, amplitude=0.5, sample_rate=SAMPLE_RATE):
+    """
+    Returns a sine wave as signed 16-bit samples: a NumPy int16 array, or an
+    array('h') when NumPy is not available.
+    """
+    num_samples = int(duration * sample_rate)
+    max_amplitude = 32767 # For 16-bit audio (signed)
+    scale = amplitude * max_amplitude
+    step = 2 * math.pi * frequency / sample_rate
+    if np is not None:
+        return (scale * np.sin(step * np.arange(num_samples))).astype(np.int16)
+    return array('h', [int(scale * math.sin(step * i)) for i in range(num_samples)])
+
+
+def interleave(samples, channels):
+    # Duplicate mono samples across every output channel
+    if channels == 1:
+        return samples
+    if np is not None and isinstance(samples, np.ndarray):
+        return np.repeat(samples, channels)
+    return array('h', [sample for sample in samples for _ in range(channels)])
+
+
+def wav_bytes(samples):
+    # WAV data is little-endian whatever the host byte order
+    if sys.byteorder == 'little':
+        return samples.tobytes()
+    swapped = array('h', samples.tobytes())
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def write_wav(filename, samples, sample_rate=SAMPLE_RATE):
+    with wave.open(filename, 'wb') as wf:
+        wf.setnchannels(NUM_CHANNELS)
+        wf.setsampwidth(BITS_PER_SAMPLE // 8)
+        wf.setframerate(sample_rate)
+        wf.writeframes(wav_bytes(samples))
+
+
+def create_simple_sound(filename, duration, frequency, amplitude=0.5):
+    """
+    Creates a simple sine wave sound and saves it to a WAV file.
+    """
+    write_wav(filename, synthesize(duration, frequency, amplitude))
+
+
+class SoundBank:
+    """
+    mixer.Sound objects built straight from synthesized buffers and cached by
+    (duration, frequency, amplitude). With `cache_dir` set, the samples are
+    also kept there as WAV files and reused on later runs.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.sounds = {}
+
+    def get(self, duration, frequency, amplitude=0.5):
+        key = (duration, frequency, amplitude)
+        sound = self.sounds.get(key)
+        if sound is None:
+            sample_rate, _, channels = mixer.get_init()
+            samples = self.load_samples(key, sample_rate)
+            sound = mixer.Sound(buffer=interleave(samples, channels).tobytes())
+            self.sounds[key] = sound
+        return sound
+
+    def cache_path(self, key, sample_rate):
+        duration, frequency, amplitude = key
+        return os.path.join(self.cache_dir, f"tone_{duration}_{frequency}_{amplitude}_{sample_rate}.wav")
+
+    def load_samples(self, key, sample_rate):
+        if self.cache_dir is None:
+            return synthesize(*key, sample_rate=sample_rate)
+
+        path = self.cache_path(key, sample_rate)
+        if os.path.exists(path):
+            with wave.open(path, 'rb') as wf:
+                samples = array('h', wf.readframes(wf.getnframes()))
+            if sys.byteorder != 'little':
+                samples.byteswap()
+            return samples
+
+        samples = synthesize(*key, sample_rate=sample_rate)
+        # Write next to the final name and rename so readers never see half a file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_wav(path + ".tmp", samples, sample_rate)
+        os.replace(path + ".tmp", path)
+        return samples
+
+
+# --- Latency measurement ---
+
+def measure_latency(buffer, trials=100):
+    """Milliseconds from play() to the mixer consuming a probe sound, sorted."""
+    mixer.quit()
+    init_mixer(buffer)
+    pool = ChannelPool()
+    probe = mixer.Sound(buffer=bytes(16 * mixer.get_init()[2]))  # A few silent samples
+    samples = []
+    for _ in range(trials):
+        start = time.perf_counter()
+        channel = pool.play('clear', probe)
+        while channel.get_busy():
+            time.sleep(0.0002)
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.002)  # Land at a different point in the next buffer period
+    return sorted(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure sound trigger latency for mixer buffer sizes")
+    sub = parser.add_subparsers(dest='command', required=True)
+    latency = sub.add_parser('latency', help="time from play() until the sound is queued")
+    latency.add_argument('--buffer', type=int, nargs='+', default=[AUDIO_BUFFER, LOW_LATENCY_BUFFER],
+                         help="mixer buffer sizes in samples")
+    latency.add_argument('--trials', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    for buffer in args.buffer:
+        samples = measure_latency(buffer, args.trials)
+        print(f"buffer {buffer:5} ({buffer / SAMPLE_RATE * 1000:5.1f} ms): "
+              f"p50 {samples[len(samples) // 2]:6.2f} ms  p95 {samples[int(len(samples) * 0.95)]:6.2f} ms  "
+              f"max {samples[-1]:6.2f} ms")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
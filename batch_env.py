@@ -0,0 +1,217 @@
+import numpy as np
+
+from engine import (
+    GRID_WIDTH, GRID_HEIGHT, SHAPES, SHAPE_NAMES, KICK_TABLE, ROTATE_CW, ROTATE_CCW, ROTATE_180,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP, ACTION_ROTATE, ACTION_HARD_DROP,
+    ACTION_ROTATE_CCW, ACTION_ROTATE_180,
+)
+
+NUM_PIECES = len(SHAPE_NAMES)
+NUM_KICKS = max(len(kicks) for turns in KICK_TABLE.values() for row in turns for kicks in row)
+
+# Rotation counts per piece id (piece id = index into SHAPE_NAMES)
+ROTATIONS = np.array([len(SHAPES[name]) for name in SHAPE_NAMES], dtype=np.int64)
+
+# CELLS[piece, rotation] -> (4, 2) cell offsets; rotations past a piece's
+# count wrap around so any rotation index is valid
+CELLS = np.array([[SHAPES[name][r % len(SHAPES[name])] for r in range(4)]
+                  for name in SHAPE_NAMES], dtype=np.int64)
+
+
+def _padded_kicks(name, start, end):
+    # Short kick lists repeat their last entry, which never changes the first valid kick
+    count = len(SHAPES[name])
+    kicks = KICK_TABLE[name][start % count][end % count]
+    return kicks + kicks[-1:] * (NUM_KICKS - len(kicks))
+
+
+# TURN_KICKS[piece, from_rotation, to_rotation] -> (NUM_KICKS, 2), engine.KICK_TABLE as one array
+TURN_KICKS = np.array([[[_padded_kicks(name, start, end) for end in range(4)] for start in range(4)]
+                       for name in SHAPE_NAMES], dtype=np.int64)
+
+# Classic Tetris scoring per number of cleared lines (times level)
+LINE_SCORES = np.array([0, 100, 300, 500, 800], dtype=np.int64)
+
+
+class BatchTetris:
+    """
+    N games stepped in lockstep with NumPy, following the TetrisEngine rules.
+
+    `boards` has shape (N, GRID_HEIGHT, GRID_WIDTH) and holds color ids
+    (0 = empty, see engine.PALETTE). Pieces are ids into SHAPE_NAMES. Every
+    call to `step` applies one action per game followed by a gravity tick
+    every `gravity_interval` steps. All work is done with whole-array
+    operations; the only Python loops run over kicks and board rows.
+    """
+
+    def __init__(self, num_games, seed=None, auto_reset=True, gravity_interval=1):
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+        self.auto_reset = auto_reset
+        self.gravity_interval = gravity_interval
+        self.index = np.arange(num_games)
+
+        self.boards = np.zeros((num_games, GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self.piece = np.zeros(num_games, dtype=np.int64)
+        self.next_piece = np.zeros(num_games, dtype=np.int64)
+        self.rotation = np.zeros(num_games, dtype=np.int64)
+        self.x = np.zeros(num_games, dtype=np.int64)
+        self.y = np.zeros(num_games, dtype=np.int64)
+        self.score = np.zeros(num_games, dtype=np.int64)
+        self.lines_cleared = np.zeros(num_games, dtype=np.int64)
+        self.level = np.ones(num_games, dtype=np.int64)
+        self.game_over = np.zeros(num_games, dtype=bool)
+        self.steps = 0
+        self.reset()
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        count = int(mask.sum())
+        if not count:
+            return
+        self.boards[mask] = 0
+        self.score[mask] = 0
+        self.lines_cleared[mask] = 0
+        self.level[mask] = 1
+        self.game_over[mask] = False
+        games = self.index[mask]
+        self.piece[games] = self._draw_pieces(games)
+        self.next_piece[games] = self._draw_pieces(games)
+        self._spawn_position(games)
+
+    def _draw_pieces(self, games):
+        # One random piece id per game in `games`
+        return self.rng.integers(0, NUM_PIECES, len(games))
+
+    def _spawn_position(self, mask):
+        self.x[mask] = GRID_WIDTH // 2 - 2
+        self.y[mask] = 0
+        self.rotation[mask] = 0
+
+    def valid_position(self, x_offset=0, y_offset=0, rotation=None):
+        """Vectorized TetrisEngine.valid_position for every game at once."""
+        if rotation is None:
+            rotation = self.rotation
+        cells = CELLS[self.piece, rotation % ROTATIONS[self.piece]]
+        block_x = (self.x + x_offset)[:, None] + cells[:, :, 0]
+        block_y = (self.y + y_offset)[:, None] + cells[:, :, 1]
+        inside = (block_x >= 0) & (block_x < GRID_WIDTH) & (block_y >= 0) & (block_y < GRID_HEIGHT)
+        occupied = self.boards[self.index[:, None],
+                               np.clip(block_y, 0, GRID_HEIGHT - 1),
+                               np.clip(block_x, 0, GRID_WIDTH - 1)] != 0
+        return (inside & ~occupied).all(axis=1)
+
+    def _shift(self, mask, dx, dy):
+        mask = mask & self.valid_position(x_offset=dx, y_offset=dy)
+        self.x += dx * mask
+        self.y += dy * mask
+        return mask
+
+    def _rotate(self, mask, turn=ROTATE_CW):
+        target = (self.rotation + turn) % ROTATIONS[self.piece]
+        pending = mask.copy()
+        kicks = TURN_KICKS[self.piece, self.rotation, target]
+        for k in range(NUM_KICKS):
+            kick_x = kicks[:, k, 0]
+            kick_y = kicks[:, k, 1]
+            ok = pending & self.valid_position(x_offset=kick_x, y_offset=kick_y, rotation=target)
+            self.x += kick_x * ok
+            self.y += kick_y * ok
+            self.rotation = np.where(ok, target, self.rotation)
+            pending &= ~ok
+            if not pending.any():
+                break
+
+    def _hard_drop(self, mask):
+        falling = mask.copy()
+        for _ in range(GRID_HEIGHT):
+            falling = self._shift(falling, 0, 1)
+            self.score += 2 * falling # Score for each cell hard dropped
+            if not falling.any():
+                break
+        self._lock(mask)
+
+    def _lock(self, mask):
+        if not mask.any():
+            return
+        games = self.index[mask]
+        cells = CELLS[self.piece[games], self.rotation[games] % ROTATIONS[self.piece[games]]]
+        block_x = self.x[games, None] + cells[:, :, 0]
+        block_y = self.y[games, None] + cells[:, :, 1]
+        inside = (block_x >= 0) & (block_x < GRID_WIDTH) & (block_y >= 0) & (block_y < GRID_HEIGHT)
+        colors = np.broadcast_to((self.piece[games] + 1)[:, None], block_x.shape)
+        rows = np.broadcast_to(games[:, None], block_x.shape)
+        self.boards[rows[inside], block_y[inside], block_x[inside]] = colors[inside]
+
+        self._check_lines(games)
+
+        # Generate new piece
+        self.piece[games] = self.next_piece[games]
+        self.next_piece[games] = self._draw_pieces(games)
+        self._spawn_position(games)
+
+        # Game over condition: new piece can't be placed
+        self.game_over |= mask & ~self.valid_position()
+
+    def _check_lines(self, games):
+        boards = self.boards[games]
+        full = (boards != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        if not cleared.any():
+            return
+        self.score[games] += LINE_SCORES[cleared] * self.level[games]
+        self.lines_cleared[games] += cleared
+        self.level[games] = np.maximum(self.level[games], 1 + self.lines_cleared[games] // 10)
+
+        # Stable sort full rows to the top, then blank them
+        rows = np.arange(GRID_HEIGHT)
+        order = np.argsort(np.where(full, -1, rows), axis=1, kind='stable')
+        boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+        boards[rows[None, :] < cleared[:, None]] = 0
+        self.boards[games] = boards
+
+    def step(self, actions):
+        """
+        Apply one action per game and run gravity.
+        Returns (score, lines, level, game_over) arrays. With auto_reset,
+        finished games report their final values and start over.
+        """
+        actions = np.asarray(actions)
+        active = ~self.game_over
+
+        self._shift(active & (actions == ACTION_LEFT), -1, 0)
+        self._shift(active & (actions == ACTION_RIGHT), 1, 0)
+        self._shift(active & (actions == ACTION_SOFT_DROP), 0, 1)
+        self._rotate(active & (actions == ACTION_ROTATE))
+        self._rotate(active & (actions == ACTION_ROTATE_CCW), ROTATE_CCW)
+        self._rotate(active & (actions == ACTION_ROTATE_180), ROTATE_180)
+        self._hard_drop(active & (actions == ACTION_HARD_DROP))
+
+        self.steps += 1
+        if self.steps % self.gravity_interval == 0:
+            falling = ~self.game_over
+            landed = falling & ~self.valid_position(y_offset=1)
+            self.y += falling & ~landed
+            self._lock(landed)
+
+        result = (self.score.copy(), self.lines_cleared.copy(),
+                  self.level.copy(), self.game_over.copy())
+        if self.auto_reset:
+            self.reset(self.game_over.copy())
+        return result
+
+
+if __name__ == "__main__":
+    import time
+
+    env = BatchTetris(4096, seed=0)
+    rng = np.random.default_rng(1)
+    steps = 200
+    start = time.perf_counter()
+    finished = 0
+    for _ in range(steps):
+        _, _, _, done = env.step(rng.integers(0, 6, env.num_games))
+        finished += int(done.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{env.num_games * steps / elapsed:,.0f} game steps/s, {finished} games finished")
@@ -0,0 +1,189 @@
+import random
+import time
+
+from engine import (
+    GRID_WIDTH, GRID_HEIGHT, SHAPES, PALETTE, COLOR_INDEX, GARBAGE, ACTIONS,
+    TetrisEngine, fixed_clock,
+)
+
+# Bit x of a row mask is column x of the board
+
+
+def build_piece_masks():
+    """
+    Precompute, for every shape and rotation, the row masks of the piece
+    shifted so its leftmost cell is bit 0, together with its bounding box:
+    (min_x, max_x, min_y, max_y, ((dy, mask), ...)).
+    """
+    masks = {}
+    for name, rotations in SHAPES.items():
+        masks[name] = []
+        for cells in rotations:
+            xs = [x for x, _ in cells]
+            ys = [y for _, y in cells]
+            rows = {}
+            for x_rel, y_rel in cells:
+                rows[y_rel] = rows.get(y_rel, 0) | (1 << (x_rel - min(xs)))
+            masks[name].append((min(xs), max(xs), min(ys), max(ys),
+                                tuple(sorted(rows.items()))))
+    return masks
+
+
+PIECE_MASKS = build_piece_masks()
+
+
+class BitboardEngine(TetrisEngine):
+    """
+    TetrisEngine with the board stored as one integer bitmask per row.
+
+    Occupancy lives in `rows` and cell colors as palette indices in the
+    `colors` bytearray (row-major). Collision is a bounds check plus one AND
+    per piece row, and a row is full when its mask equals `full_row`. `grid`
+    is rebuilt on demand so the renderer can keep reading colors.
+
+    Measured with `python bitboard.py`, collision checks run about 1.5-1.75x
+    as fast as on the list grid (e.g. 2.1M vs 1.3M checks/s). Each check is
+    still a Python call with a few dict and tuple lookups, and that overhead
+    dominates, so the gain is far from the order of magnitude a bitboard
+    gets in a compiled language.
+    """
+
+    def clear_board(self):
+        self.rows = [0] * self.height
+        self.colors = bytearray(self.width * self.height)
+        self.full_row = (1 << self.width) - 1
+        self.clear_counters()
+
+    @property
+    def grid(self):
+        width = self.width
+        return [[PALETTE[c] for c in self.colors[y * width:(y + 1) * width]]
+                for y in range(self.height)]
+
+    def valid_position(self, piece, x_offset=0, y_offset=0, rotation_offset=0):
+        masks = PIECE_MASKS[piece['name']]
+        min_x, max_x, min_y, max_y, piece_rows = masks[(piece['rotation'] + rotation_offset) % len(masks)]
+        x = piece['x'] + x_offset + min_x
+        y = piece['y'] + y_offset
+        if x < 0 or x + max_x - min_x >= self.width or y + min_y < 0 or y + max_y >= self.height:
+            return False
+        rows = self.rows
+        for dy, mask in piece_rows:
+            if rows[y + dy] & (mask << x):
+                return False
+        return True
+
+    def occupied(self, x, y):
+        return self.rows[y] >> x & 1
+
+    def full_rows(self, rows=None):
+        # Only rows that just received cells can have become full
+        candidates = range(self.height) if rows is None else sorted(rows)
+        board, full = self.rows, self.full_row
+        return [y for y in candidates if board[y] == full]
+
+    def place_piece(self, piece):
+        color = COLOR_INDEX[piece['color']]
+        width = self.width
+        touched = set()
+        for x_offset, y_offset in piece['shape'][piece['rotation']]:
+            block_x = piece['x'] + x_offset
+            block_y = piece['y'] + y_offset
+            if 0 <= block_x < width and 0 <= block_y < self.height:
+                bit = 1 << block_x
+                if not self.rows[block_y] & bit:
+                    self.row_fill[block_y] += 1
+                self.rows[block_y] |= bit
+                self.colors[block_y * width + block_x] = color
+                touched.add(block_y)
+                if block_y < self.column_top[block_x]:
+                    self.column_top[block_x] = block_y
+        if touched:
+            self.stack_top = min(self.stack_top, min(touched))
+        return touched
+
+    def push_rows(self, top, count, hole):
+        width = self.width
+        garbage = bytearray([COLOR_INDEX[GARBAGE]]) * width
+        garbage[hole] = 0
+        self.rows[top - count:] = self.rows[top:] + [((1 << width) - 1) & ~(1 << hole)] * count
+        self.colors[(top - count) * width:] = self.colors[top * width:] + garbage * count
+
+    def row_colors(self, y):
+        return [PALETTE[c] for c in self.colors[y * self.width:(y + 1) * self.width]]
+
+    def board_bytes(self):
+        return bytes(self.colors)
+
+    def remove_rows(self, rows):
+        # Same stack-only shift as TetrisEngine.remove_rows, on masks and color bytes
+        rows = sorted(rows)
+        self.lower_column_tops(rows)
+        top, bottom = self.stack_top, rows[-1]
+        width = self.width
+        cleared = set(rows)
+        kept = [y for y in range(top, bottom + 1) if y not in cleared]
+        colors = self.colors
+        self.rows[top:bottom + 1] = [0] * len(rows) + [self.rows[y] for y in kept]
+        colors[top * width:(bottom + 1) * width] = (bytes(len(rows) * width)
+                                                    + b''.join(colors[y * width:(y + 1) * width] for y in kept))
+        self.row_fill[top:bottom + 1] = [0] * len(rows) + [self.row_fill[y] for y in kept]
+        self.stack_top = top + len(rows)
+
+
+# Board sizes the differential check cycles through
+CHECK_SIZES = ((GRID_WIDTH, GRID_HEIGHT), (10, 20), (5, 40), (17, 9))
+
+
+def differential_check(games=200, steps=400, seed=0):
+    """
+    Play the same random games on the list grid and the bitboard and assert
+    that boards, pieces, counters, skylines and emitted events stay identical.
+    """
+    for game in range(games):
+        width, height = CHECK_SIZES[game % len(CHECK_SIZES)]
+        reference = TetrisEngine(clock=fixed_clock, rng=random.Random(seed + game),
+                                 width=width, height=height)
+        bitboard = BitboardEngine(clock=fixed_clock, rng=random.Random(seed + game),
+                                  width=width, height=height)
+        actions = random.Random(-1 - seed - game)
+        for _ in range(steps):
+            action = actions.choice(ACTIONS)
+            reference.apply_action(action)
+            bitboard.apply_action(action)
+            if actions.random() < 0.2:
+                reference.tick()
+                bitboard.tick()
+            assert reference.grid == bitboard.grid
+            assert reference.row_fill == bitboard.row_fill
+            assert reference.column_top == bitboard.column_top
+            assert reference.ghost_y() == bitboard.ghost_y()
+            assert reference.current_piece == bitboard.current_piece
+            assert reference.next_piece == bitboard.next_piece
+            assert (reference.score, reference.lines_cleared, reference.level, reference.game_over) == \
+                (bitboard.score, bitboard.lines_cleared, bitboard.level, bitboard.game_over)
+            assert reference.drain_events() == bitboard.drain_events()
+            if reference.game_over:
+                break
+
+
+def _collision_rate(engine, seconds=0.5):
+    piece = dict(engine.current_piece)
+    checks = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        for x in range(-2, engine.width):
+            piece['x'] = x
+            for y in range(engine.height):
+                piece['y'] = y
+                engine.valid_position(piece)
+                checks += 1
+    return checks / seconds
+
+
+if __name__ == "__main__":
+    # The differential check runs as a test: python -m pytest test_bitboard.py
+    reference = TetrisEngine(clock=fixed_clock, rng=random.Random(0))
+    bitboard = BitboardEngine(clock=fixed_clock, rng=random.Random(0))
+    print(f"list grid: {_collision_rate(reference):,.0f} collision checks/s")
+    print(f"bitboard:  {_collision_rate(bitboard):,.0f} collision checks/s")
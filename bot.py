@@ -0,0 +1,306 @@
+"""
+Placement-search bot.
+
+For the current piece the bot enumerates every rotation it can turn to in
+place (through the engine's kick tables, turning either way or by half a
+turn), slides it left and right as far as it can go and drops it, finding
+the landing row from the board's skyline (the engine's own column_top for
+the current board). Each resulting board is scored with a weighted
+heuristic (aggregate height, holes, bumpiness, lines cleared). With
+lookahead the best placement of the next piece on each resulting board is
+added. Boards are tuples of row bitmasks (see bitboard.py), so they
+double as cache keys for the bounded LRU of evaluations.
+"""
+import time
+from collections import OrderedDict
+
+from engine import (
+    GRID_WIDTH, SHAPES, BOTTOM_PROFILES, KICK_TABLE, ROTATE_CW, ROTATE_CCW, ROTATE_180, landing_row,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_ROTATE_CCW, ACTION_ROTATE_180, ACTION_HARD_DROP,
+)
+from bitboard import PIECE_MASKS
+
+# Heuristic weights (aggregate height, lines, holes, bumpiness)
+WEIGHTS = {
+    'height': -0.510066,
+    'lines': 0.760666,
+    'holes': -0.35663,
+    'bumpiness': -0.184483,
+}
+
+# Turns tried when expanding rotations, and the action for each
+TURN_ACTIONS = {
+    ROTATE_CW: ACTION_ROTATE,
+    ROTATE_CCW: ACTION_ROTATE_CCW,
+    ROTATE_180: ACTION_ROTATE_180,
+}
+
+
+def board_rows(engine):
+    """The engine's board as a tuple of row bitmasks."""
+    rows = getattr(engine, 'rows', None)
+    if rows is not None:
+        return tuple(rows)
+    top = engine.stack_top  # Nothing is locked above it
+    return tuple([0] * top + [sum(1 << x for x, color in enumerate(row) if color) for row in engine.grid[top:]])
+
+
+def fits(rows, name, rotation, x, y, width=GRID_WIDTH):
+    min_x, max_x, min_y, max_y, piece_rows = PIECE_MASKS[name][rotation]
+    x += min_x
+    if x < 0 or x + max_x - min_x >= width or y + min_y < 0 or y + max_y >= len(rows):
+        return False
+    for dy, mask in piece_rows:
+        if rows[y + dy] & (mask << x):
+            return False
+    return True
+
+
+def skyline(rows, width=GRID_WIDTH, top=0):
+    """
+    Highest occupied row of each column, len(rows) where a column is empty.
+    Rows above `top` must be empty.
+    """
+    tops = [len(rows)] * width
+    seen = 0
+    full_row = (1 << width) - 1
+    for y in range(top, len(rows)):
+        mask = rows[y]
+        new = mask & ~seen
+        while new:
+            low = new & -new
+            tops[low.bit_length() - 1] = y
+            new ^= low
+        seen |= mask
+        if seen == full_row:
+            break
+    return tops
+
+
+def drop(rows, name, rotation, x, y, width=GRID_WIDTH, tops=None):
+    """
+    Drop a piece from (x, y) and return (new rows, lines cleared, top),
+    where every row above `top` of the new rows is empty.
+    """
+    tops = tops or skyline(rows, width)
+    landing = landing_row(tops, BOTTOM_PROFILES[name][rotation], x, y)
+    if landing is not None:
+        y = landing
+    else:
+        while fits(rows, name, rotation, x, y + 1, width):
+            y += 1
+    min_x, _, min_y, _, piece_rows = PIECE_MASKS[name][rotation]
+    board = list(rows)
+    full_row = (1 << width) - 1
+    full = []
+    for dy, mask in piece_rows:
+        board[y + dy] |= mask << (x + min_x)
+        if board[y + dy] == full_row:
+            full.append(y + dy)
+    # Only the rows the piece lands in can fill up
+    for row in reversed(full):
+        del board[row]
+    lines = len(full)
+    return tuple([0] * lines + board), lines, min(min(tops), y + min_y) + lines
+
+
+def rotations(rows, name, rotation, x, y, width=GRID_WIDTH):
+    """
+    Every rotation a piece at (rotation, x, y) can turn to in place, kicking
+    exactly as the engine does: {rotation: (x, y, turns)} with the fewest
+    turns. Empty if the piece doesn't fit where it is.
+    """
+    if not fits(rows, name, rotation, x, y, width):
+        return {}
+    count = len(SHAPES[name])
+    kicks = KICK_TABLE[name]
+    reached = {rotation: (x, y, ())}
+    frontier = [rotation]
+    while frontier:
+        turned = []
+        for start in frontier:
+            x, y, turns = reached[start]
+            for turn in TURN_ACTIONS:
+                end = (start + turn) % count
+                if end in reached:
+                    continue
+                for kick_x, kick_y in kicks[start][end]:
+                    if fits(rows, name, end, x + kick_x, y + kick_y, width):
+                        reached[end] = (x + kick_x, y + kick_y, turns + (turn,))
+                        turned.append(end)
+                        break
+        frontier = turned
+    return reached
+
+
+def placements(rows, name, x, y, width=GRID_WIDTH, tops=None, rotation=0):
+    """
+    Yield (rotation, x, rows after drop, lines, top) for every reachable
+    placement of a piece at (rotation, x, y), as in `drop`. `tops` is the
+    board's skyline if the caller already has it.
+    """
+    tops = tops or skyline(rows, width)
+    for rotation, (x, y, _) in sorted(rotations(rows, name, rotation, x, y, width).items()):
+        yield (rotation, x) + drop(rows, name, rotation, x, y, width, tops)
+        for step in (-1, 1):
+            target = x + step
+            while fits(rows, name, rotation, target, y, width):
+                yield (rotation, target) + drop(rows, name, rotation, target, y, width, tops)
+                target += step
+
+
+def evaluate_board(rows, width=GRID_WIDTH, top=0):
+    # Rows above `top` must be empty
+    heights = [0] * width
+    seen = 0
+    holes = 0
+    height = len(rows)
+    for y in range(top, height):
+        mask = rows[y]
+        holes += (seen & ~mask).bit_count()
+        new = mask & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= mask
+    bumpiness = sum(abs(heights[i] - heights[i + 1]) for i in range(width - 1))
+    return (WEIGHTS['height'] * sum(heights) + WEIGHTS['holes'] * holes
+            + WEIGHTS['bumpiness'] * bumpiness)
+
+
+class PlacementBot:
+    """
+    Picks a placement for each new piece and feeds it to the engine one
+    action at a time through `next_action(engine)`.
+
+    `time_budget` (seconds) bounds the search for a single move; with None
+    the search always completes, which keeps results reproducible.
+    """
+
+    def __init__(self, lookahead=True, time_budget=None, cache_size=100000):
+        self.lookahead = lookahead
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.nodes = 0
+        self.search_time = 0.0
+        self._piece = None
+        self._target = None
+        self._turns = []
+        self._actions_left = 0
+
+    def _cached(self, key, compute):
+        cache = self.cache
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            self.cache_hits += 1
+            return value
+        self.cache_misses += 1
+        value = compute()
+        if value is None:  # Cut off before it finished
+            return None
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def _board_value(self, rows, width, top=0):
+        self.nodes += 1
+        return self._cached(rows, lambda: evaluate_board(rows, width, top))
+
+    def _best_next_value(self, rows, name, width, top=0, deadline=None):
+        # None if the deadline passed before every placement was scored
+        def compute():
+            best = None
+            x = width // 2 - 2
+            tops = skyline(rows, width, top)
+            for _, _, after, lines, after_top in placements(rows, name, x, 0, width, tops):
+                if deadline is not None and time.perf_counter() > deadline:
+                    return None
+                value = WEIGHTS['lines'] * lines + self._board_value(after, width, after_top)
+                if best is None or value > best:
+                    best = value
+            # No legal spawn for the next piece means this line loses
+            return best if best is not None else float('-inf')
+        return self._cached((rows, name), compute)
+
+    def search(self, engine, rows=None):
+        """Return the best (rotation, x) for the engine's current piece; `rows` is its board_rows if known."""
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else None
+        piece = engine.current_piece
+        rows = board_rows(engine) if rows is None else rows
+        width = engine.width
+
+        candidates = []
+        for rotation, x, after, lines, top in placements(rows, piece['name'], piece['x'], piece['y'], width,
+                                                         engine.column_top, piece['rotation']):
+            value = WEIGHTS['lines'] * lines + self._board_value(after, width, top)
+            candidates.append((value, rotation, x, after, lines, top))
+            if deadline is not None and time.perf_counter() > deadline:
+                break  # Keep what was found; the first placement always counts
+        if not candidates:
+            self.search_time += time.perf_counter() - start
+            return None
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        best = candidates[0]
+
+        if self.lookahead:
+            # Deepen the most promising placements first so a cut-off keeps the best ones
+            best_deep = None
+            for value, rotation, x, after, lines, top in candidates:
+                next_value = self._best_next_value(after, engine.next_piece['name'], width, top, deadline)
+                if next_value is None:
+                    break
+                deep = WEIGHTS['lines'] * lines + next_value
+                if best_deep is None or deep > best_deep[0]:
+                    best_deep = (deep, rotation, x)
+            if best_deep is not None:
+                best = best_deep
+
+        self.search_time += time.perf_counter() - start
+        return best[1], best[2]
+
+    def next_action(self, engine):
+        piece = engine.current_piece
+        if piece is not self._piece:
+            self._piece = piece
+            rows = board_rows(engine)
+            self._target = self.search(engine, rows)
+            self._turns = []
+            if self._target is not None:
+                reached = rotations(rows, piece['name'], piece['rotation'], piece['x'], piece['y'], engine.width)
+                self._turns = list(reached[self._target[0]][2])
+            # Enough for a full slide across the board plus every rotation
+            self._actions_left = engine.width + len(piece['shape']) + 2
+        if self._target is None or self._actions_left <= 0:
+            return ACTION_HARD_DROP
+        self._actions_left -= 1
+        rotation, x = self._target
+        if piece['rotation'] != rotation:
+            # The planned turns, then plain clockwise turns if gravity spoiled the plan
+            return TURN_ACTIONS[self._turns.pop(0) if self._turns else ROTATE_CW]
+        if piece['x'] < x:
+            return ACTION_RIGHT
+        if piece['x'] > x:
+            return ACTION_LEFT
+        return ACTION_HARD_DROP
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'nodes': self.nodes,
+            'nodes_per_second': self.nodes / self.search_time if self.search_time else 0.0,
+            'cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'cache_entries': len(self.cache),
+        }
+
+
+def make_policy(rng):
+    """selfplay.py policy factory; no time budget so runs stay reproducible."""
+    bot = PlacementBot()
+    return bot.next_action
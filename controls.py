@@ -0,0 +1,148 @@
+"""
+Keyboard input with delayed auto-shift (DAS) and auto-repeat (ARR).
+
+Events are timestamped with a monotonic millisecond clock as soon as they
+are polled, and the game loop polls during its idle time between frames
+as well, so timestamps are finer than the frame rate. Gameplay inputs are
+queued and replayed in time order against the simulation timeline by
+`advance`, interleaved with the repeats of held keys: a held left, right
+or down key acts once on press, again after `das` ms and then every
+`arr` ms.
+
+Each applied key press is tracked from its timestamp to the moment the
+simulation applied it and to the next presented frame; `latency_stats`
+summarises the recent samples.
+"""
+import time
+from collections import deque
+
+import pygame
+
+from engine import ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP
+
+DAS_MS = 170
+ARR_MS = 50
+REPEATABLE = (ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP)
+LATENCY_WINDOW = 500  # Most recent samples kept per latency measure
+
+
+def now_ms():
+    return time.perf_counter() * 1000
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class InputHandler:
+    def __init__(self, das=DAS_MS, arr=ARR_MS):
+        self.das = das
+        self.arr = max(1, arr)
+        self.events = []  # (time_ms, pygame event) polled but not yet handled
+        self.queue = deque()  # (time_ms, action, pressed) waiting for the simulation
+        self.held = {}  # Repeatable action -> time of its next repeat
+        self.horizontal = None  # The held left/right key that currently repeats
+        self.unpresented = []  # (event time, applied time) since the last present
+        self.latency = {name: deque(maxlen=LATENCY_WINDOW)
+                        for name in ('event_to_apply', 'apply_to_present', 'event_to_present')}
+
+    # --- Collecting ---
+
+    def poll(self):
+        time_ms = now_ms()
+        for event in pygame.event.get():
+            self.events.append((time_ms, event))
+
+    def take_events(self):
+        self.poll()
+        events, self.events = self.events, []
+        return events
+
+    def press(self, time_ms, action):
+        self.queue.append((time_ms, action, True))
+
+    def release(self, time_ms, action):
+        self.queue.append((time_ms, action, False))
+
+    def clear(self):
+        # Drop queued inputs and held keys, e.g. when a menu takes over
+        self.queue.clear()
+        self.held.clear()
+        self.horizontal = None
+
+    # --- Applying ---
+
+    def next_repeat(self):
+        # The earliest repeat due among keys allowed to repeat, or None
+        times = [self.held[action] for action in (self.horizontal, ACTION_SOFT_DROP)
+                 if action in self.held]
+        return min(times) if times else None
+
+    def advance(self, until_ms, apply):
+        """
+        Apply queued inputs and key repeats due up to `until_ms`, in time
+        order. `apply(action, event_time)` gets None as the event time for
+        repeats.
+        """
+        queue = self.queue
+        while True:
+            repeat_at = self.next_repeat()
+            if queue and (repeat_at is None or queue[0][0] <= repeat_at):
+                if queue[0][0] > until_ms:
+                    return
+                time_ms, action, pressed = queue.popleft()
+                if pressed:
+                    self.start_hold(time_ms, action)
+                    apply(action, time_ms)
+                else:
+                    self.end_hold(time_ms, action)
+            elif repeat_at is not None and repeat_at <= until_ms:
+                action = ACTION_SOFT_DROP if self.held.get(ACTION_SOFT_DROP) == repeat_at else self.horizontal
+                self.held[action] = repeat_at + self.arr
+                apply(action, None)
+            else:
+                return
+
+    def start_hold(self, time_ms, action):
+        if action not in REPEATABLE:
+            return
+        self.held[action] = time_ms + self.das
+        if action != ACTION_SOFT_DROP:
+            self.horizontal = action  # The latest direction wins
+
+    def end_hold(self, time_ms, action):
+        if self.held.pop(action, None) is None or action != self.horizontal:
+            return
+        # Fall back to the other direction if it is still held, charging DAS again
+        other = ACTION_RIGHT if action == ACTION_LEFT else ACTION_LEFT
+        self.horizontal = other if other in self.held else None
+        if self.horizontal is not None:
+            self.held[other] = time_ms + self.das
+
+    # --- Latency ---
+
+    def applied(self, event_time):
+        applied_at = now_ms()
+        self.latency['event_to_apply'].append(applied_at - event_time)
+        self.unpresented.append((event_time, applied_at))
+
+    def presented(self):
+        presented_at = now_ms()
+        for event_time, applied_at in self.unpresented:
+            self.latency['apply_to_present'].append(presented_at - applied_at)
+            self.latency['event_to_present'].append(presented_at - event_time)
+        self.unpresented.clear()
+
+    def latency_stats(self):
+        stats = {}
+        for name, samples in self.latency.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            stats[name] = {
+                'count': len(ordered),
+                'p50': percentile(ordered, 0.5),
+                'p95': percentile(ordered, 0.95),
+                'max': ordered[-1],
+            }
+        return stats
@@ -0,0 +1,336 @@
+"""
+Training datasets of (state, action, reward) transitions.
+
+A dataset is a directory of fixed-width NumPy record files, each a
+memory-mapped .npy holding up to `chunk_records` transitions (as many as
+fit in CHUNK_BYTES, whatever the board size), plus meta.json with the
+board size and the number of records written. A chunk file starts at one
+block and doubles as it fills, so small datasets stay small on disk.
+Records are staged in a small in-memory block and copied into the current
+chunk a block at a time; meta.json is replaced atomically after every
+block, so a reader (or a crash) only ever sees whole records. Reading
+maps the chunks rather than loading them, so memory use stays flat
+however large the dataset grows.
+
+Each record holds the board before the action (color ids, see
+engine.PALETTE), the current piece id (index into SHAPE_NAMES), its
+rotation and position, the next piece id, the action, the reward (the
+line-clear score from calculate_score at the level before the action) and
+whether the action ended the game.
+
+    python tetris.py --dataset data/human            # record while playing
+    python dataset.py record data/bot --games 100 --policy bot
+    python dataset.py info data/bot
+    python dataset.py sample data/bot -n 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import (
+    GRID_WIDTH, GRID_HEIGHT, SHAPE_NAMES, PIECE_IDS, ACTIONS, ACTION_GRAVITY, TetrisEngine, fixed_clock,
+)
+
+CHUNK_BYTES = 256 << 20  # Largest chunk file
+BLOCK_RECORDS = 4096
+META_FILE = 'meta.json'
+RECORDED_ACTIONS = frozenset(ACTIONS + (ACTION_GRAVITY,))  # Pause and restart aren't transitions
+SCALAR_FIELDS = ('piece', 'rotation', 'x', 'y', 'next_piece', 'action', 'reward', 'game_over')
+
+
+def transition_dtype(width=GRID_WIDTH, height=GRID_HEIGHT):
+    return np.dtype([
+        ('board', np.uint8, (height, width)),
+        ('piece', np.uint8),
+        ('rotation', np.uint8),
+        ('x', np.int8),
+        ('y', np.int16),
+        ('next_piece', np.uint8),
+        ('action', np.uint8),
+        ('reward', np.int32),
+        ('game_over', np.bool_),
+    ])
+
+
+def chunk_records_for(dtype, chunk_bytes=CHUNK_BYTES):
+    return max(1, chunk_bytes // dtype.itemsize)
+
+
+def chunk_path(path, index):
+    return os.path.join(path, f"chunk_{index:06d}.npy")
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+class TransitionWriter:
+    """
+    Appends transitions to a dataset directory, creating it or continuing
+    an existing one. Use as a context manager or call `close`.
+    """
+
+    def __init__(self, path, width=GRID_WIDTH, height=GRID_HEIGHT, chunk_records=None,
+                 block_records=BLOCK_RECORDS):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.count = 0
+        if os.path.exists(os.path.join(path, META_FILE)):
+            meta = read_meta(path)
+            if (meta['width'], meta['height']) != (width, height):
+                raise ValueError(f"{path} holds {meta['width']}x{meta['height']} boards, not {width}x{height}")
+            self.count = meta['count']
+            chunk_records = meta['chunk_records']
+        self.width = width
+        self.height = height
+        self.dtype = transition_dtype(width, height)
+        self.chunk_records = chunk_records or chunk_records_for(self.dtype)
+        self.block_records = block_records
+        self.block = np.zeros(block_records, dtype=self.dtype)
+        self.boards = bytearray()  # Staged records: board bytes back to back...
+        self.fields = []  # ...and a tuple of the other fields per record
+        self.chunk = None
+        self.chunk_index = None
+
+    def append(self, board, piece, rotation, x, y, next_piece, action, reward, game_over):
+        """Stage one transition; `board` is height * width color id bytes, row by row."""
+        self.boards += board
+        self.fields.append((piece, rotation, x, y, next_piece, action, reward, game_over))
+        if len(self.fields) == self.block_records:
+            self.flush()
+
+    def open_chunk(self, index):
+        path = chunk_path(self.path, index)
+        self.chunk = np.load(path, mmap_mode='r+') if os.path.exists(path) else None
+        self.chunk_index = index
+
+    def grow_chunk(self, needed, written):
+        # Copy the chunk's `written` records into a file with room for at least
+        # `needed`, doubling up to chunk_records; readers keep the old file
+        # they mapped until they reopen.
+        size = 0 if self.chunk is None else len(self.chunk)
+        capacity = min(self.chunk_records, max(needed, 2 * size, self.block_records))
+        path = chunk_path(self.path, self.chunk_index)
+        temp = path + '.tmp'
+        chunk = np.lib.format.open_memmap(temp, mode='w+', dtype=self.dtype, shape=(capacity,))
+        if written:
+            chunk[:written] = self.chunk[:written]
+        chunk.flush()
+        os.replace(temp, path)
+        self.chunk = chunk
+
+    def flush(self):
+        """Copy staged records into the chunk files and publish the new count."""
+        pending = len(self.fields)
+        block = self.block[:pending]
+        if pending:
+            block['board'] = np.frombuffer(self.boards, dtype=np.uint8).reshape(pending, self.height, self.width)
+            for name, column in zip(SCALAR_FIELDS, zip(*self.fields)):
+                block[name] = column
+            self.boards.clear()
+            self.fields.clear()
+        done = 0
+        while done < pending:
+            index, offset = divmod(self.count, self.chunk_records)
+            if index != self.chunk_index:
+                if self.chunk is not None:
+                    self.chunk.flush()
+                self.open_chunk(index)
+            n = min(pending - done, self.chunk_records - offset)
+            if self.chunk is None or len(self.chunk) < offset + n:
+                self.grow_chunk(offset + n, offset)
+            self.chunk[offset:offset + n] = block[done:done + n]
+            self.count += n
+            done += n
+        if self.chunk is not None:
+            self.chunk.flush()
+        self.write_meta()
+
+    def write_meta(self):
+        meta = {
+            'width': self.width,
+            'height': self.height,
+            'chunk_records': self.chunk_records,
+            'count': self.count,
+            'dtype': str(self.dtype),
+        }
+        temp = os.path.join(self.path, META_FILE + '.tmp')
+        with open(temp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        self.flush()
+        self.chunk = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DatasetRecorder:
+    """
+    Attach to an engine as `engine.recorder` to turn every action it applies
+    into a transition. The state is captured before each action and the
+    transition is completed when the next action (or `finish`) comes in.
+    Pass the replay recorder as `forward` to keep recording replays too.
+    """
+
+    def __init__(self, writer, engine, forward=None):
+        self.writer = writer
+        self.engine = engine
+        self.forward = forward
+        self.before = None  # (board, piece fields, action, level, lines) awaiting its outcome
+
+    def record(self, time_ms, action):
+        if self.forward is not None:
+            self.forward.record(time_ms, action)
+        self.finish()
+        engine = self.engine
+        if action in RECORDED_ACTIONS and not engine.game_over and not engine.paused:
+            piece = engine.current_piece
+            self.before = (engine.board_bytes(), PIECE_IDS[piece['name']], piece['rotation'], piece['x'],
+                           piece['y'], PIECE_IDS[engine.next_piece['name']], action, engine.level,
+                           engine.lines_cleared)
+
+    def finish(self):
+        # Complete the pending transition with the outcome of its action
+        if self.before is None:
+            return
+        board, piece, rotation, x, y, next_piece, action, level, lines = self.before
+        self.before = None
+        engine = self.engine
+        reward = engine.calculate_score(engine.lines_cleared - lines, level)
+        self.writer.append(board, piece, rotation, x, y, next_piece, action, reward, engine.game_over)
+
+    def close(self):
+        self.finish()
+        self.writer.close()
+
+
+class TransitionDataset:
+    """Read-only view of a dataset directory; chunks are memory-mapped, never loaded."""
+
+    def __init__(self, path):
+        meta = read_meta(path)
+        self.width = meta['width']
+        self.height = meta['height']
+        self.chunk_records = meta['chunk_records']
+        self.count = meta['count']
+        self.dtype = transition_dtype(self.width, self.height)
+        chunks = -(-self.count // self.chunk_records)
+        self.chunks = [np.load(chunk_path(path, i), mmap_mode='r') for i in range(chunks)]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        chunk, offset = divmod(index, self.chunk_records)
+        return self.chunks[chunk][offset]
+
+    def batches(self, batch_size=BLOCK_RECORDS, start=0, stop=None):
+        """Yield consecutive record arrays in file order (views into the maps where possible)."""
+        stop = self.count if stop is None else min(stop, self.count)
+        position = start
+        while position < stop:
+            chunk, offset = divmod(position, self.chunk_records)
+            n = min(batch_size, stop - position, self.chunk_records - offset)
+            yield self.chunks[chunk][offset:offset + n]
+            position += n
+
+    def take(self, indices):
+        """Records at `indices` (any order) as a new array."""
+        indices = np.asarray(indices, dtype=np.int64)
+        out = np.empty(len(indices), dtype=self.dtype)
+        chunks, offsets = np.divmod(indices, self.chunk_records)
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            out[mask] = self.chunks[chunk][offsets[mask]]
+        return out
+
+    def sample(self, batch_size, rng=None):
+        """A uniform random batch (with replacement)."""
+        rng = np.random.default_rng() if rng is None else rng
+        return self.take(rng.integers(0, self.count, batch_size))
+
+
+# --- Command line ---
+
+def record_games(path, policy_name, games, first_seed=0, max_pieces=10000, gravity_interval=1):
+    """Play seeded self-play games (see selfplay.py) into a dataset; returns the records added."""
+    from selfplay import load_policy
+
+    with TransitionWriter(path) as writer:
+        start = writer.count
+        for seed in range(first_seed, first_seed + games):
+            engine = TetrisEngine(clock=fixed_clock, rng=random.Random(seed))
+            recorder = engine.recorder = DatasetRecorder(writer, engine)
+            policy = load_policy(policy_name)(random.Random(f"policy:{seed}"))
+            steps = 0
+            while not engine.game_over and engine.pieces_placed < max_pieces:
+                engine.apply_action(policy(engine))
+                steps += 1
+                if steps % gravity_interval == 0 and not engine.game_over:
+                    engine.apply_action(ACTION_GRAVITY)
+                engine.events.clear()
+            recorder.finish()
+    return writer.count - start  # Counted after close has flushed the last block
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and inspect Tetris transition datasets")
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help="record self-play games")
+    record.add_argument('path')
+    record.add_argument('--games', type=int, default=10)
+    record.add_argument('--first-seed', type=int, default=0)
+    record.add_argument('--policy', default='random', help="as in selfplay.py")
+    record.add_argument('--max-pieces', type=int, default=10000)
+    info = sub.add_parser('info', help="summarise a dataset")
+    info.add_argument('path')
+    sample = sub.add_parser('sample', help="print random transitions")
+    sample.add_argument('path')
+    sample.add_argument('-n', type=int, default=5)
+    sample.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        start = time.perf_counter()
+        added = record_games(args.path, args.policy, args.games, args.first_seed, args.max_pieces)
+        elapsed = time.perf_counter() - start
+        print(f"{added:,} transitions in {elapsed:.1f} s ({added / elapsed:,.0f}/s)")
+        return 0
+
+    dataset = TransitionDataset(args.path)
+    if args.command == 'info':
+        rewards = games = 0
+        for batch in dataset.batches(1 << 16):
+            rewards += int(batch['reward'].sum())
+            games += int(batch['game_over'].sum())
+        print(f"{len(dataset):,} transitions of {dataset.width}x{dataset.height} boards in "
+              f"{len(dataset.chunks)} chunk(s), {games:,} game overs, total reward {rewards:,}")
+        return 0
+
+    for record in dataset.sample(args.n, np.random.default_rng(args.seed)):
+        print(f"piece {SHAPE_NAMES[record['piece']]} r{record['rotation']} at ({record['x']}, {record['y']}), "
+              f"next {SHAPE_NAMES[record['next_piece']]}, action {record['action']}, "
+              f"reward {record['reward']}, game over {bool(record['game_over'])}")
+        for row in record['board']:
+            print('  ' + ''.join('#' if cell else '.' for cell in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
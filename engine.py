@@ -0,0 +1,559 @@
+import random
+import time
+
+# --- Constants ---
+GRID_WIDTH = 8
+GRID_HEIGHT = 14
+MAX_WIDTH = 64
+MAX_HEIGHT = 1000
+
+# Colors
+BLUE = (0, 0, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+YELLOW = (255, 255, 0)
+ORANGE = (255, 165, 0)
+PURPLE = (128, 0, 128)
+CYAN = (0, 255, 255)
+DARK_BLUE = (0, 0, 139)
+GARBAGE = (128, 128, 128)  # Rows sent by an opponent in versus play (see server.py)
+
+# Tetromino shapes (rotated versions of 0 degrees)
+# Each shape is represented by a list of relative coordinates (x, y)
+SHAPES = {
+    'I': [
+        [(0, 1), (1, 1), (2, 1), (3, 1)],  # I
+        [(1, 0), (1, 1), (1, 2), (1, 3)]
+    ],
+    'J': [
+        [(0, 0), (0, 1), (1, 1), (2, 1)],  # J
+        [(1, 0), (2, 0), (1, 1), (1, 2)],
+        [(0, 1), (1, 1), (2, 1), (2, 2)],
+        [(1, 0), (1, 1), (0, 2), (1, 2)]
+    ],
+    'L': [
+        [(2, 0), (0, 1), (1, 1), (2, 1)],  # L
+        [(1, 0), (1, 1), (1, 2), (2, 2)],
+        [(0, 0), (0, 1), (1, 1), (2, 1)],
+        [(0, 0), (1, 0), (1, 1), (1, 2)]
+    ],
+    'O': [
+        [(0, 0), (1, 0), (0, 1), (1, 1)]  # O
+    ],
+    'S': [
+        [(1, 0), (2, 0), (0, 1), (1, 1)],  # S
+        [(0, 0), (0, 1), (1, 1), (1, 2)]
+    ],
+    'T': [
+        [(1, 0), (0, 1), (1, 1), (2, 1)],  # T
+        [(1, 0), (1, 1), (2, 1), (1, 2)],
+        [(0, 1), (1, 1), (2, 1), (1, 2)],
+        [(1, 0), (0, 1), (1, 1), (1, 2)]
+    ],
+    'Z': [
+        [(0, 0), (1, 0), (1, 1), (2, 1)],  # Z
+        [(2, 0), (1, 1), (2, 1), (1, 2)]
+    ]
+}
+SHAPE_NAMES = list(SHAPES.keys())
+PIECE_IDS = {name: i for i, name in enumerate(SHAPE_NAMES)}  # Compact piece ids for files and packets
+
+# Colors for each Tetromino
+COLORS = {
+    'I': CYAN,
+    'J': DARK_BLUE,
+    'L': ORANGE,
+    'O': YELLOW,
+    'S': GREEN,
+    'T': PURPLE,
+    'Z': RED
+}
+
+# Compact color ids: 0 means empty, 1.. follow SHAPE_NAMES, then garbage
+PALETTE = [''] + [COLORS[name] for name in SHAPE_NAMES] + [GARBAGE]
+COLOR_INDEX = {color: i for i, color in enumerate(PALETTE)}
+
+# Rotation turns, in rotation steps
+ROTATE_CW = 1
+ROTATE_CCW = -1
+ROTATE_180 = 2
+
+# SRS state (0, R, 2, L numbered 0-3) of each rotation in SHAPES. I, S and Z
+# only have two rotations here; the second is the SRS state it matches.
+SRS_STATES = {
+    'I': (0, 3),
+    'J': (0, 1, 2, 3),
+    'L': (0, 1, 2, 3),
+    'O': (0,),
+    'S': (0, 3),
+    'T': (0, 1, 2, 3),
+    'Z': (0, 1),
+}
+
+# SRS offset data per state, x right and y up as published. A turn's kick
+# tests are the from-state offsets minus the to-state offsets, made relative
+# to the first test.
+SRS_OFFSETS = {
+    'JLSTZ': (
+        ((0, 0), (0, 0), (0, 0), (0, 0), (0, 0)),
+        ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+        ((0, 0), (0, 0), (0, 0), (0, 0), (0, 0)),
+        ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    ),
+    'I': (
+        ((0, 0), (-1, 0), (2, 0), (-1, 0), (2, 0)),
+        ((-1, 0), (0, 0), (0, 0), (0, 1), (0, -2)),
+        ((-1, 1), (1, 1), (-2, 1), (1, 0), (-2, 0)),
+        ((0, 1), (0, 1), (0, 1), (0, -1), (0, 2)),
+    ),
+}
+
+
+def build_kick_table():
+    """
+    KICK_TABLE[name][from_rotation][to_rotation]: the (dx, dy) offsets tried
+    in order for that turn, in board coordinates (y down). Quarter turns get
+    the standard SRS tests. SRS defines no half turns, so theirs come from the
+    same offset data, without repeats. A turn to the same rotation (a half
+    turn of I, S or Z, any turn of O) only tests (0, 0).
+    """
+    table = {}
+    for name, states in SRS_STATES.items():
+        offsets = SRS_OFFSETS['I' if name == 'I' else 'JLSTZ']
+        table[name] = []
+        for start in states:
+            row = []
+            for end in states:
+                first_x = offsets[start][0][0] - offsets[end][0][0]
+                first_y = offsets[start][0][1] - offsets[end][0][1]
+                kicks = []
+                for (from_x, from_y), (to_x, to_y) in zip(offsets[start], offsets[end]):
+                    kick = (from_x - to_x - first_x, first_y - (from_y - to_y))
+                    if kick not in kicks:
+                        kicks.append(kick)
+                row.append(tuple(kicks))
+            table[name].append(tuple(row))
+        table[name] = tuple(table[name])
+    return table
+
+
+KICK_TABLE = build_kick_table()
+
+
+def build_bottom_profiles():
+    """
+    For every shape and rotation, the lowest cell of each column the piece
+    covers: ((dx, dy), ...). With a column-height map this gives the row a
+    piece lands on in one pass over its columns.
+    """
+    profiles = {}
+    for name, rotations in SHAPES.items():
+        profiles[name] = []
+        for cells in rotations:
+            bottoms = {}
+            for x, y in cells:
+                bottoms[x] = max(y, bottoms.get(x, y))
+            profiles[name].append(tuple(sorted(bottoms.items())))
+    return profiles
+
+
+BOTTOM_PROFILES = build_bottom_profiles()
+
+
+def landing_row(column_top, profile, x, y):
+    """
+    The row a piece with this bottom profile at (x, y) lands on, given each
+    column's highest locked row. None if the piece is already at or below the
+    top of one of its columns (tucked under an overhang), where the skyline
+    can't tell.
+    """
+    landing = None
+    for dx, bottom in profile:
+        top = column_top[x + dx]
+        if top <= y + bottom:
+            return None
+        row = top - 1 - bottom
+        if landing is None or row < landing:
+            landing = row
+    return landing
+
+
+# Player actions accepted by TetrisEngine.apply_action / step
+ACTION_NONE = 0
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_SOFT_DROP = 3
+ACTION_ROTATE = 4
+ACTION_HARD_DROP = 5
+
+# Game-flow actions; gravity is an action so replays can reproduce it exactly
+ACTION_GRAVITY = 6
+ACTION_PAUSE = 7
+ACTION_RESTART = 8
+
+# ACTION_ROTATE turns clockwise; these came later, hence the numbering
+ACTION_ROTATE_CCW = 9
+ACTION_ROTATE_180 = 10
+
+ACTIONS = (ACTION_NONE, ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP,
+           ACTION_ROTATE, ACTION_HARD_DROP, ACTION_ROTATE_CCW, ACTION_ROTATE_180)
+
+
+def monotonic_ms():
+    # High-resolution and never steps backwards, unlike time.time()
+    return time.perf_counter() * 1000
+
+
+def fixed_clock():
+    # For headless runs where only gravity actions advance time
+    return 0
+
+
+class TetrisEngine:
+    """
+    Game rules without any pygame dependency.
+
+    The engine owns the board, the falling pieces and the counters. Anything
+    the front end should react to (sounds, particles) is queued in `events`
+    as (name, data) tuples and collected with `drain_events`.
+    `clock` returns the current time in milliseconds and `rng` only needs a
+    `choice` method, so both can be swapped out for headless simulation.
+
+    The board is `width` x `height`. A count of locked cells is kept per row
+    (`row_fill`) so a lock only checks the rows the piece touched, and
+    `stack_top` bounds the highest occupied row so clearing lines only moves
+    the stack, not the empty space above it. Locking therefore costs the same
+    on a 1000-row board as on the default one. `column_top` holds each
+    column's highest locked row (the skyline), from which `landing_y` finds
+    where a piece would drop to without stepping down row by row.
+    """
+
+    def __init__(self, clock=monotonic_ms, rng=None, width=GRID_WIDTH, height=GRID_HEIGHT):
+        if not (4 <= width <= MAX_WIDTH and 4 <= height <= MAX_HEIGHT):
+            raise ValueError(f"the board must be between 4x4 and {MAX_WIDTH}x{MAX_HEIGHT}")
+        self.width = width
+        self.height = height
+        self.clock = clock
+        self.rng = rng if rng is not None else random
+        self.events = []
+        self.recorder = None  # Anything with record(time_ms, action), see replay.py
+        self.reset()
+
+    def reset(self):
+        self.clear_board()
+        self.board_version = 0  # bumped whenever locked cells change
+        self.current_piece = self.new_piece()
+        self.next_piece = self.new_piece()
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.pieces_placed = 0
+        self.drop_speed = 1000  # milliseconds
+        self.last_drop_time = self.clock()
+        self.game_over = False
+        self.paused = False
+
+    def create_empty_grid(self):
+        return [['' for _ in range(self.width)] for _ in range(self.height)]
+
+    def clear_board(self):
+        self.grid = self.create_empty_grid()
+        self.clear_counters()
+
+    def clear_counters(self):
+        self.row_fill = [0] * self.height  # Locked cells per row
+        self.stack_top = self.height  # No locked cells above this row
+        self.column_top = [self.height] * self.width  # Highest locked row per column
+        self.ghost_piece = None  # The piece ghost_row was computed for...
+        self.ghost_key = None  # ...at this (x, rotation, board_version)
+        self.ghost_row = None
+
+    def new_piece(self):
+        shape_name = self.rng.choice(SHAPE_NAMES)
+        return {
+            'shape': SHAPES[shape_name],
+            'color': COLORS[shape_name],
+            'x': self.width // 2 - 2,
+            'y': 0,
+            'rotation': 0,
+            'name': shape_name
+        }
+
+    def drain_events(self):
+        events = self.events
+        self.events = []
+        return events
+
+    # --- Board primitives ---
+
+    def valid_position(self, piece, x_offset=0, y_offset=0, rotation_offset=0):
+        test_rotation = (piece['rotation'] + rotation_offset) % len(piece['shape'])
+        for x_rel, y_rel in piece['shape'][test_rotation]:
+            block_x = piece['x'] + x_rel + x_offset
+            block_y = piece['y'] + y_rel + y_offset
+
+            # Check boundaries
+            if not (0 <= block_x < self.width and 0 <= block_y < self.height):
+                return False
+            # Check collision with existing blocks in the grid
+            if self.grid[block_y][block_x]:
+                return False
+        return True
+
+    def occupied(self, x, y):
+        return bool(self.grid[y][x])
+
+    def landing_y(self, piece):
+        """The row `piece` would come to rest on if dropped straight down."""
+        landing = landing_row(self.column_top, BOTTOM_PROFILES[piece['name']][piece['rotation']],
+                              piece['x'], piece['y'])
+        if landing is not None:
+            return landing
+        # Under an overhang: step down the rows below the piece
+        y_offset = 0
+        while self.valid_position(piece, y_offset=y_offset + 1):
+            y_offset += 1
+        return piece['y'] + y_offset
+
+    def ghost_y(self):
+        """Landing row of the falling piece, recomputed only after it moves or rotates."""
+        piece = self.current_piece
+        key = (piece['x'], piece['rotation'], self.board_version)
+        if piece is not self.ghost_piece or key != self.ghost_key:
+            # Falling straight down never changes where the piece lands, so y isn't part of the key
+            self.ghost_piece, self.ghost_key = piece, key
+            self.ghost_row = self.landing_y(piece)
+        return self.ghost_row
+
+    def place_piece(self, piece):
+        """Write a piece's cells into the board; returns the set of rows it touched."""
+        touched = set()
+        for x_offset, y_offset in piece['shape'][piece['rotation']]:
+            block_x = piece['x'] + x_offset
+            block_y = piece['y'] + y_offset
+            if 0 <= block_x < self.width and 0 <= block_y < self.height:
+                row = self.grid[block_y]
+                if not row[block_x]:
+                    self.row_fill[block_y] += 1
+                row[block_x] = piece['color']
+                touched.add(block_y)
+                if block_y < self.column_top[block_x]:
+                    self.column_top[block_x] = block_y
+        if touched:
+            self.stack_top = min(self.stack_top, min(touched))
+        return touched
+
+    def full_rows(self, rows=None):
+        # Only rows that just received cells can have become full
+        candidates = range(self.height) if rows is None else sorted(rows)
+        return [y for y in candidates if self.row_fill[y] == self.width]
+
+    def row_colors(self, y):
+        return list(self.grid[y])
+
+    def board_bytes(self):
+        """Locked cells as row-major color ids (see PALETTE)."""
+        return bytes(COLOR_INDEX[color] for row in self.grid for color in row)
+
+    def lower_column_tops(self, rows):
+        # Called before `rows` are removed: a column's top cell moves down by the
+        # number of cleared rows beneath it, or if it is itself cleared, the next
+        # surviving cell down the column becomes the top
+        cleared = set(rows)
+        column_top = self.column_top
+        for x, y in enumerate(column_top):
+            while y < self.height and (y in cleared or not self.occupied(x, y)):
+                y += 1
+            column_top[x] = y if y == self.height else y + sum(1 for row in rows if row > y)
+
+    def remove_rows(self, rows):
+        # Remove cleared lines and shift the stack above them down in one slice
+        # assignment; the empty rows above the stack never move
+        rows = sorted(rows)
+        self.lower_column_tops(rows)
+        top, bottom = self.stack_top, rows[-1]
+        cleared = set(rows)
+        kept = [y for y in range(top, bottom + 1) if y not in cleared]
+        self.grid[top:bottom + 1] = ([['' for _ in range(self.width)] for _ in rows]
+                                     + [self.grid[y] for y in kept])
+        self.row_fill[top:bottom + 1] = [0] * len(rows) + [self.row_fill[y] for y in kept]
+        self.stack_top = top + len(rows)
+
+    def add_garbage(self, count, hole):
+        """
+        Push the stack up `count` rows and fill the bottom with garbage rows,
+        each open at column `hole`. Cells pushed off the top end the game, as
+        does the falling piece no longer fitting.
+        """
+        count = min(count, self.height)
+        if count <= 0:
+            return
+        overflow = count > self.stack_top
+        top = max(self.stack_top, count)  # Rows above this one are empty or lost
+        self.push_rows(top, count, hole)
+        self.row_fill[top - count:] = self.row_fill[top:] + [self.width - 1] * count
+        self.stack_top = top - count
+        if overflow:
+            self.column_top = [next((y for y in range(self.height) if self.occupied(x, y)), self.height)
+                               for x in range(self.width)]
+        else:
+            self.column_top = [top_y - count if top_y < self.height or x != hole else top_y
+                               for x, top_y in enumerate(self.column_top)]
+        self.board_version += 1
+        self.events.append(('garbage', count))
+        if overflow or not self.valid_position(self.current_piece):
+            self.game_over = True
+            self.events.append(('gameover', None))
+
+    def push_rows(self, top, count, hole):
+        # Move rows top.. up by count and append the garbage rows below them
+        garbage = [GARBAGE] * self.width
+        garbage[hole] = ''
+        self.grid[top - count:] = self.grid[top:] + [garbage[:] for _ in range(count)]
+
+    # --- Rules ---
+
+    def move(self, dx):
+        if self.valid_position(self.current_piece, x_offset=dx):
+            self.current_piece['x'] += dx
+            self.events.append(('move', dx))
+            return True
+        return False
+
+    def soft_drop(self):
+        if self.valid_position(self.current_piece, y_offset=1):
+            self.current_piece['y'] += 1
+            return True
+        return False
+
+    def rotate_piece(self, turn=ROTATE_CW):
+        # Walk the precompiled kicks for this turn; the piece only changes once one fits
+        piece = self.current_piece
+        rotation = piece['rotation']
+        target = (rotation + turn) % len(piece['shape'])
+        for kick_x, kick_y in KICK_TABLE[piece['name']][rotation][target]:
+            if self.valid_position(piece, kick_x, kick_y, target - rotation):
+                piece['x'] += kick_x
+                piece['y'] += kick_y
+                piece['rotation'] = target
+                self.events.append(('rotate', None))
+                return True
+        return False
+
+    def lock_piece(self, piece):
+        touched = self.place_piece(piece)
+        self.pieces_placed += 1
+
+        self.events.append(('drop', None))
+        self.check_lines(touched)
+        self.board_version += 1
+
+        # Generate new piece
+        self.current_piece = self.next_piece
+        self.next_piece = self.new_piece()
+
+        # Game over condition: new piece can't be placed
+        if not self.valid_position(self.current_piece):
+            self.game_over = True
+            self.events.append(('gameover', None))
+
+    def check_lines(self, rows=None):
+        lines_to_clear = self.full_rows(rows)
+
+        if lines_to_clear:
+            num_cleared = len(lines_to_clear)
+            self.score += self.calculate_score(num_cleared)
+            self.lines_cleared += num_cleared
+            self.update_level()
+            self.events.append(('clear', [(y, self.row_colors(y)) for y in lines_to_clear]))
+            self.remove_rows(lines_to_clear)
+        return len(lines_to_clear)
+
+    def calculate_score(self, num_lines, level=None):
+        # Classic Tetris scoring, at the current level unless told otherwise
+        level = self.level if level is None else level
+        if num_lines == 1:
+            return 100 * level
+        elif num_lines == 2:
+            return 300 * level
+        elif num_lines == 3:
+            return 500 * level
+        elif num_lines == 4: # Tetris!
+            return 800 * level
+        return 0
+
+    def update_level(self):
+        new_level = 1 + (self.lines_cleared // 10)
+        if new_level > self.level:
+            self.level = new_level
+            self.drop_speed = max(50, 1000 - (self.level - 1) * 70) # Increase speed, min 50ms
+
+    def hard_drop(self):
+        landing = self.ghost_y()
+        self.score += 2 * (landing - self.current_piece['y']) # Score for each cell hard dropped
+        self.current_piece['y'] = landing
+
+        self.lock_piece(self.current_piece)
+        self.events.append(('drop', None))
+
+    def tick(self):
+        """Apply one gravity step: drop the piece a row or lock it."""
+        if self.valid_position(self.current_piece, y_offset=1):
+            self.current_piece['y'] += 1
+        else:
+            self.lock_piece(self.current_piece)
+
+    # --- Stepping API ---
+
+    def apply_action(self, action):
+        if self.recorder is not None:
+            self.recorder.record(self.clock(), action)
+
+        if action == ACTION_RESTART:
+            self.reset()
+            return
+        if action == ACTION_PAUSE:
+            if not self.game_over:
+                self.paused = not self.paused
+            return
+        if self.game_over or self.paused:
+            return
+        if action == ACTION_GRAVITY:
+            self.tick()
+        elif action == ACTION_LEFT:
+            self.move(-1)
+        elif action == ACTION_RIGHT:
+            self.move(1)
+        elif action == ACTION_SOFT_DROP:
+            self.soft_drop()
+        elif action == ACTION_ROTATE:
+            self.rotate_piece()
+        elif action == ACTION_ROTATE_CCW:
+            self.rotate_piece(ROTATE_CCW)
+        elif action == ACTION_ROTATE_180:
+            self.rotate_piece(ROTATE_180)
+        elif action == ACTION_HARD_DROP:
+            self.hard_drop()
+
+    def update(self):
+        if self.game_over or self.paused:
+            return
+
+        # Auto drop; the schedule advances by whole intervals so it doesn't drift,
+        # and resyncs if it fell more than one interval behind (e.g. after a pause)
+        current_time = self.clock()
+        if current_time - self.last_drop_time > self.drop_speed:
+            self.apply_action(ACTION_GRAVITY)
+            self.last_drop_time += self.drop_speed
+            if current_time - self.last_drop_time > self.drop_speed:
+                self.last_drop_time = current_time
+
+    def step(self, action=ACTION_NONE):
+        """
+        Apply `action`, then let gravity run against the clock.
+        Returns (score gained, game over).
+        """
+        score_before = self.score
+        self.apply_action(action)
+        self.update()
+        return self.score - score_before, self.game_over
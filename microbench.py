@@ -0,0 +1,475 @@
+"""
+Microbenchmarks for the game's hot paths.
+
+Everything runs headless under the SDL dummy video and audio drivers on
+fixed, seeded boards, so results from different runs and machines are
+comparable. Each benchmark is timed over `--repeat` samples, each long
+enough (`--min-time`) to swamp timer resolution, and stored as seconds per
+operation.
+
+    python microbench.py run --save baseline.json
+    python microbench.py run --save after.json --filter draw
+    python microbench.py compare baseline.json after.json --threshold 0.05
+
+`compare` reports a regression only when the median slowed down by more
+than the threshold and a Mann-Whitney U test says the two sets of samples
+differ (p < --alpha), so ordinary noise between runs isn't flagged.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from engine import (
+    GRID_WIDTH, GRID_HEIGHT, SHAPES, COLORS, SHAPE_NAMES, ROTATE_CW, ROTATE_CCW, ROTATE_180, TetrisEngine,
+    fixed_clock,
+)
+from bitboard import BitboardEngine
+from scores import SCORE_DB
+
+ENGINES = {
+    'list': TetrisEngine,
+    'bitboard': BitboardEngine,
+}
+
+BENCHMARKS = {}
+SCRATCH_DIR = None  # Temporary directory for files the benchmarks write, set by run
+
+
+def benchmark(name):
+    """Register a setup function; it returns the zero-argument operation to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# --- Fixtures ---
+
+def make_piece(name, x, y, rotation=0):
+    return {
+        'shape': SHAPES[name],
+        'color': COLORS[name],
+        'x': x,
+        'y': y,
+        'rotation': rotation,
+        'name': name,
+    }
+
+
+def make_engine(engine_class, full_rows=0, seed=0, width=GRID_WIDTH, height=GRID_HEIGHT):
+    """
+    An engine with a seeded mid-game board: `full_rows` complete rows at the
+    bottom and ragged rows with holes above them, six rows in total.
+    """
+    engine = engine_class(clock=fixed_clock, rng=random.Random(seed), width=width, height=height)
+    rng = random.Random(seed)
+    for y in range(height - 6, height):
+        full = y >= height - full_rows
+        for x in range(width):
+            if full or rng.random() < 0.6:
+                color = COLORS[rng.choice(SHAPE_NAMES)]
+                engine.place_piece({'shape': [[(0, 0)]], 'rotation': 0, 'x': x, 'y': y, 'color': color})
+    engine.current_piece = make_piece('T', width // 2 - 2, 0)
+    engine.next_piece = make_piece('I', width // 2 - 2, 0)
+    return engine
+
+
+def snapshot(engine, margin=4):
+    """
+    The stack plus `margin` empty rows above it, the skyline and the game
+    state a lock changes; benchmarks only place pieces in those rows, so
+    restoring costs the same whatever the board's height.
+    """
+    top = max(0, engine.stack_top - margin)
+    counters = (top, engine.row_fill[top:], engine.stack_top, engine.column_top[:],
+                (engine.score, engine.lines_cleared, engine.level, engine.pieces_placed, engine.game_over),
+                dict(engine.current_piece), dict(engine.next_piece))
+    if isinstance(engine, BitboardEngine):
+        return counters, engine.rows[top:], bytes(engine.colors[top * engine.width:])
+    return counters, [row[:] for row in engine.grid[top:]]
+
+
+def restore(engine, board, check=False):
+    """
+    Put a snapshot back. The board version is bumped rather than restored so
+    the ghost cache never serves a row computed for another board. With
+    `check`, assert the engine now matches the snapshot exactly.
+    """
+    (top, row_fill, stack_top, column_top, game, piece, next_piece), cells = board[0], board[1:]
+    if isinstance(engine, BitboardEngine):
+        engine.rows[top:] = cells[0]
+        engine.colors[top * engine.width:] = cells[1]
+    else:
+        engine.grid[top:] = [row[:] for row in cells[0]]
+    engine.row_fill[top:] = row_fill
+    engine.stack_top = stack_top
+    engine.column_top[:] = column_top
+    engine.score, engine.lines_cleared, engine.level, engine.pieces_placed, engine.game_over = game
+    engine.current_piece = dict(piece)
+    engine.next_piece = dict(next_piece)
+    engine.board_version += 1
+    engine.events.clear()
+    if check:
+        assert snapshot(engine, stack_top - top) == board, "restore left the engine off its snapshot"
+        assert not any(engine.row_fill[:top]), "a benchmark placed cells above the snapshot"
+
+
+def checked(engine, board, op):
+    # Run the operation once and make sure restoring undoes all of it
+    op()
+    restore(engine, board, check=True)
+    return op
+
+
+def make_game(full_rows=0):
+    from tetris import Tetris
+
+    return Tetris(engine=make_engine(TetrisEngine, full_rows), audio=False,
+                  score_db=os.path.join(SCRATCH_DIR, SCORE_DB))
+
+
+def seed_particles(game):
+    # Same particle trajectories on every run
+    import tetris
+
+    if isinstance(game.particles, tetris.ParticleSystem):
+        game.particles.rng = tetris.np.random.default_rng(0)
+    else:
+        random.seed(0)
+
+
+# --- Engine benchmarks ---
+
+def engine_benchmarks(engine_name, engine_class):
+    @benchmark(f'valid_position[{engine_name}]')
+    def valid_position():
+        engine = make_engine(engine_class)
+        piece = engine.current_piece
+        check = engine.valid_position
+        return lambda: check(piece, 0, 1)
+
+    @benchmark(f'rotate_piece_kick[{engine_name}]')
+    def rotate_piece_kick():
+        # A vertical I flush against the right wall has to kick to rotate
+        engine = make_engine(engine_class)
+        template = make_piece('I', GRID_WIDTH - 2, 2, rotation=1)
+
+        def op():
+            engine.current_piece = dict(template)
+            engine.rotate_piece()
+            engine.events.clear()
+        return op
+
+    @benchmark(f'rotate_piece_turns[{engine_name}]')
+    def rotate_piece_turns():
+        # A T turning right, left and half way round in the open: one table walk each
+        engine = make_engine(engine_class)
+        engine.current_piece = make_piece('T', GRID_WIDTH // 2 - 2, 4)
+        rotate = engine.rotate_piece
+        events = engine.events
+
+        def op():
+            rotate(ROTATE_CW)
+            rotate(ROTATE_CCW)
+            rotate(ROTATE_180)
+            events.clear()
+        return op
+
+    for full_rows in range(5):
+        @benchmark(f'check_lines_{full_rows}[{engine_name}]')
+        def check_lines(full_rows=full_rows):
+            engine = make_engine(engine_class, full_rows)
+            board = snapshot(engine)
+
+            def op():
+                restore(engine, board)
+                engine.check_lines()
+            return checked(engine, board, op)
+
+    @benchmark(f'lock_piece[{engine_name}]')
+    def lock_piece():
+        engine = make_engine(engine_class)
+        board = snapshot(engine)
+        template = make_piece('T', 2, GRID_HEIGHT - 8)
+
+        def op():
+            restore(engine, board)
+            engine.lock_piece(dict(template))
+        return checked(engine, board, op)
+
+    for width, height in ((GRID_WIDTH, GRID_HEIGHT), (64, 1000)):
+        # An O piece completing two lines on the default board and on the largest one;
+        # the cost shouldn't grow with the board's height
+        @benchmark(f'lock_clear_{width}x{height}[{engine_name}]')
+        def lock_clear(width=width, height=height):
+            engine = engine_class(clock=fixed_clock, rng=random.Random(0), width=width, height=height)
+            for y in (height - 2, height - 1):
+                for x in range(2, width):
+                    engine.place_piece({'shape': [[(0, 0)]], 'rotation': 0, 'x': x, 'y': y,
+                                        'color': COLORS['I']})
+            board = snapshot(engine)
+            template = make_piece('O', 0, height - 2)
+
+            def op():
+                restore(engine, board)
+                engine.lock_piece(dict(template))
+            return checked(engine, board, op)
+
+    @benchmark(f'hard_drop[{engine_name}]')
+    def hard_drop():
+        engine = make_engine(engine_class)
+        board = snapshot(engine)
+        template = make_piece('L', 2, 0)
+
+        def op():
+            restore(engine, board)
+            engine.current_piece = dict(template)
+            engine.hard_drop()
+        return checked(engine, board, op)
+
+    @benchmark(f'savestate_save[{engine_name}]')
+    def savestate_save():
+        from savestate import save_state
+
+        engine = make_engine(engine_class)
+        buffer = bytearray()
+        return lambda: save_state(engine, buffer)
+
+    @benchmark(f'savestate_load[{engine_name}]')
+    def savestate_load():
+        from savestate import save_state, load_state
+
+        engine = make_engine(engine_class)
+        state = bytes(save_state(engine))
+        return lambda: load_state(engine, state)
+
+
+for _name, _engine_class in ENGINES.items():
+    engine_benchmarks(_name, _engine_class)
+
+
+# --- Rendering, particles and sound ---
+
+@benchmark('draw_ghost_piece')
+def draw_ghost_piece():
+    game = make_game()
+
+    def op():
+        piece = game.current_piece
+        game.screen.blits(game.piece_tiles(piece, game.grid_offset_x, game.grid_offset_y,
+                                           y=game.ghost_y(), tile=game.ghost_tile,
+                                           first_row=game.view_top),
+                          doreturn=False)
+    return op
+
+
+@benchmark('draw_frame')
+def draw_frame():
+    game = make_game()
+    return game.draw
+
+
+@benchmark('draw_frame_dirty')
+def draw_frame_dirty():
+    # A frame where only the falling piece moved
+    game = make_game()
+    game.dirty_rects = True
+    game.draw()
+    piece = game.current_piece
+
+    def op():
+        piece['x'] ^= 1
+        game.draw()
+    return op
+
+
+@benchmark('particles_4_line_clear')
+def particles_4_line_clear():
+    # The whole effect: emit for four cleared rows, then update and draw until it dies out
+    game = make_game(full_rows=4)
+    cleared = [(y, game.engine.row_colors(y)) for y in game.engine.full_rows()]
+    particles = game.particles
+
+    def op():
+        seed_particles(game)
+        game.create_line_clear_particles(cleared)
+        while len(particles):
+            particles.update()
+            particles.draw(game.screen)
+    return op
+
+
+@benchmark('create_simple_sound')
+def create_simple_sound():
+    from audio import SOUND_EFFECTS, create_simple_sound
+
+    path = os.path.join(SCRATCH_DIR, 'clear.wav')
+    duration, frequency, amplitude = SOUND_EFFECTS['clear']
+    return lambda: create_simple_sound(path, duration, frequency, amplitude)
+
+
+# --- Running ---
+
+def time_operation(op, repeat, min_time):
+    """Return `repeat` samples of seconds per call, each over enough calls to last min_time."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.1))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            op()
+        samples.append((time.perf_counter() - start) / loops)
+    return samples, loops
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:7.2f} {unit}"
+    return f"{seconds / 1e-9:7.2f} ns"
+
+
+def run(names, repeat, min_time):
+    global SCRATCH_DIR
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='microbench-') as SCRATCH_DIR:
+        try:
+            for name in names:
+                op = BENCHMARKS[name]()
+                samples, loops = time_operation(op, repeat, min_time)
+                results[name] = {'samples': samples, 'loops': loops}
+                print(f"{name:32} {format_time(statistics.median(samples))}"
+                      f"  +- {format_time(statistics.pstdev(samples)).strip()}", flush=True)
+        finally:
+            pygame.quit()
+            SCRATCH_DIR = None
+    return results
+
+
+# --- Comparing ---
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected)."""
+    n1, n2 = len(a), len(b)
+    ranked = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        size = j - i + 1
+        ties += size ** 3 - size
+        i = j + 1
+    r1 = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+
+def compare(before, after, threshold, alpha):
+    """Print a comparison table; returns the names of significant regressions."""
+    regressions = []
+    for name, result in after['results'].items():
+        if name not in before['results']:
+            continue
+        old = before['results'][name]['samples']
+        new = result['samples']
+        ratio = statistics.median(new) / statistics.median(old)
+        p = mann_whitney_p(old, new)
+        verdict = ''
+        if p < alpha and ratio > 1 + threshold:
+            verdict = 'REGRESSION'
+            regressions.append(name)
+        elif p < alpha and ratio < 1 / (1 + threshold):
+            verdict = 'faster'
+        print(f"{name:32} {format_time(statistics.median(old))} -> {format_time(statistics.median(new))}"
+              f"  x{ratio:5.2f}  p={p:.3f}  {verdict}")
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetris hot-path microbenchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    run_parser.add_argument('--repeat', type=int, default=15, help="samples per benchmark")
+    run_parser.add_argument('--min-time', type=float, default=0.02, help="seconds per sample")
+    run_parser.add_argument('--save', help="write the results as a JSON baseline")
+    run_parser.add_argument('--baseline', help="compare against a saved baseline when done")
+    compare_parser = sub.add_parser('compare', help="compare two saved result files")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    for p in (run_parser, compare_parser):
+        p.add_argument('--threshold', type=float, default=0.05,
+                       help="relative slowdown of the median that counts as a regression")
+        p.add_argument('--alpha', type=float, default=0.01, help="significance level")
+    sub.add_parser('list', help="list the benchmark names")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    if args.command == 'compare':
+        before, after = load(args.before), load(args.after)
+    else:
+        names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+        after = {
+            'meta': {
+                'python': platform.python_version(),
+                'pygame': pygame.version.ver,
+                'machine': platform.machine(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': run(names, args.repeat, args.min_time),
+        }
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(after, f, indent=1)
+        if not args.baseline:
+            return 0
+        before = load(args.baseline)
+
+    regressions = compare(before, after, args.threshold, args.alpha)
+    if regressions:
+        print(f"{len(regressions)} significant regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Per-phase frame profiler.
+
+`FrameProfiler.instrument(obj, names)` replaces the named methods on one
+instance with timing wrappers, so nothing is wrapped (and nothing costs
+anything) unless profiling is switched on. Durations go into preallocated
+ring buffers: a rolling window per phase for the p50/p95/p99/max shown
+in the HUD, and a longer one of trace events that `export` writes as a
+Chrome trace (open it in chrome://tracing or Perfetto) next to a CSV
+summary (counts and totals over the whole run, percentiles over the
+window).
+
+    python tetris.py --profile frame_profile    # F3 toggles the HUD
+"""
+import csv
+import json
+import time
+from array import array
+
+import pygame
+
+from controls import percentile
+
+WINDOW = 600  # Samples per phase behind the rolling percentiles
+TRACE_EVENTS = 200000  # Most recent spans kept for the trace export
+HUD_REFRESH_S = 0.25
+HUD_POSITION = (10, 180)
+
+
+class FrameProfiler:
+    def __init__(self):
+        self.phases = []
+        self.index = {}
+        self.samples = []  # Per phase: ring of the last WINDOW durations (seconds)
+        self.counts = array('q')
+        self.totals = array('d')
+        self.trace_phase = array('H', bytes(2 * TRACE_EVENTS))
+        self.trace_start = array('d', bytes(8 * TRACE_EVENTS))
+        self.trace_duration = array('d', bytes(8 * TRACE_EVENTS))
+        self.trace_count = 0
+        self.origin = time.perf_counter()
+        self.last_frame = None
+        self.hud_visible = False
+        self.hud_surface = None
+        self.hud_extent = None  # Largest area the HUD has covered, for dirty rects
+        self.hud_updated = 0.0
+        self.hud_font = None
+
+    def phase(self, name):
+        index = self.index.get(name)
+        if index is None:
+            index = self.index[name] = len(self.phases)
+            self.phases.append(name)
+            self.samples.append(array('d', bytes(8 * WINDOW)))
+            self.counts.append(0)
+            self.totals.append(0.0)
+        return index
+
+    def record(self, index, start, end):
+        duration = end - start
+        count = self.counts[index]
+        self.samples[index][count % WINDOW] = duration
+        self.counts[index] = count + 1
+        self.totals[index] += duration
+        slot = self.trace_count % TRACE_EVENTS
+        self.trace_phase[slot] = index
+        self.trace_start[slot] = start
+        self.trace_duration[slot] = duration
+        self.trace_count += 1
+
+    def timed(self, name, func):
+        index = self.phase(name)
+        record = self.record
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(index, start, clock())
+        return wrapper
+
+    def instrument(self, obj, names):
+        for name in names:
+            setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def end_frame(self):
+        # Called once per loop iteration; the span between calls is the frame time
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.record(self.phase('frame'), self.last_frame, now)
+        self.last_frame = now
+
+    # --- Statistics ---
+
+    def stats(self):
+        """Rolling percentiles per phase, in milliseconds."""
+        stats = {}
+        for index, name in enumerate(self.phases):
+            count = self.counts[index]
+            if not count:
+                continue
+            ordered = sorted(self.samples[index][:min(count, WINDOW)])
+            stats[name] = {
+                'count': count,
+                'mean': self.totals[index] / count * 1000,
+                'p50': percentile(ordered, 0.5) * 1000,
+                'p95': percentile(ordered, 0.95) * 1000,
+                'p99': percentile(ordered, 0.99) * 1000,
+                'max': ordered[-1] * 1000,
+            }
+        return stats
+
+    # --- HUD ---
+
+    def toggle_hud(self):
+        self.hud_visible = not self.hud_visible
+        self.hud_surface = None
+
+    def hud_rect(self):
+        return self.hud_extent
+
+    def draw_hud(self, screen):
+        now = time.perf_counter()
+        if self.hud_surface is None or now - self.hud_updated > HUD_REFRESH_S:
+            self.hud_surface = self.render_hud()
+            self.hud_updated = now
+            rect = self.hud_surface.get_rect(topleft=HUD_POSITION)
+            self.hud_extent = rect if self.hud_extent is None else rect.union(self.hud_extent)
+        screen.blit(self.hud_surface, HUD_POSITION)
+
+    def render_hud(self):
+        if self.hud_font is None:
+            pygame.font.init()
+            self.hud_font = pygame.font.Font(None, 18)
+        lines = [f"{'phase':18}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}  ms"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:18}{s['p50']:7.2f}{s['p95']:7.2f}{s['p99']:7.2f}{s['max']:7.2f}")
+        rendered = [self.hud_font.render(line, True, (220, 220, 220)) for line in lines]
+        line_height = self.hud_font.get_linesize()
+        surface = pygame.Surface((max(r.get_width() for r in rendered) + 10,
+                                  line_height * len(rendered) + 10), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 200))
+        for i, line in enumerate(rendered):
+            surface.blit(line, (5, 5 + i * line_height))
+        return surface
+
+    # --- Export ---
+
+    def trace_events(self):
+        first = max(0, self.trace_count - TRACE_EVENTS)
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'main'}}]
+        for n in range(first, self.trace_count):
+            slot = n % TRACE_EVENTS
+            events.append({
+                'name': self.phases[self.trace_phase[slot]],
+                'ph': 'X',
+                'pid': 1,
+                'tid': 1,
+                'ts': round((self.trace_start[slot] - self.origin) * 1e6, 1),
+                'dur': round(self.trace_duration[slot] * 1e6, 1),
+            })
+        return events
+
+    def export(self, prefix):
+        """Write <prefix>.json (Chrome trace events) and <prefix>.csv (per-phase summary)."""
+        with open(prefix + '.json', 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        with open(prefix + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['phase', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for name, s in self.stats().items():
+                total = self.totals[self.index[name]] * 1000
+                writer.writerow([name, s['count'], f"{total:.3f}", f"{s['mean']:.4f}", f"{s['p50']:.4f}",
+                                 f"{s['p95']:.4f}", f"{s['p99']:.4f}", f"{s['max']:.4f}"])
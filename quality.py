@@ -0,0 +1,122 @@
+"""
+Adaptive render quality.
+
+The governor is told how long each frame's work took (everything but the
+wait for the next frame) and compares the slow end of the recent frames
+with the frame budget, 1000 / fps ms. When they come close to the budget
+it steps quality down one level. It steps back up only after the recent
+frames have stayed well under budget for RECOVER_FRAMES frames in a row,
+and every change starts a fresh window, so each level is judged on its
+own frames. A step up that is undone straight away doubles the wait
+before the next one (halved again by each step up that holds), so load
+the effects can't relieve doesn't make quality flicker. Uncapped rendering
+has no frame budget, so there the governor only records work times.
+
+Levels, from full quality down; each keeps the savings of the ones above:
+
+    0 full          everything
+    1 few particles a line clear emits at most PARTICLE_CAP particles
+    2 no particles  line clears emit none
+    3 no overlays   pause, game over and high scores skip the translucent backdrop
+    4 slow HUD      score, level and lines are refreshed every SLOW_HUD_MS
+
+    python tetris.py --quality-report       # print the stats on exit
+    python tetris.py --quality 2            # pin a level instead
+"""
+from array import array
+
+from controls import percentile
+
+PARTICLE_CAP = 256
+SLOW_HUD_MS = 250
+WINDOW = 30  # Frames behind each decision
+HISTORY = 600  # Frames behind the reported percentiles
+STEP_DOWN = 0.9  # Step down when the window's p90 passes this fraction of the budget...
+STEP_UP = 0.6  # ...and back up once it has stayed under this one
+RECOVER_FRAMES = 120
+MAX_RECOVER_FRAMES = 16 * RECOVER_FRAMES
+
+QUALITY_LEVELS = (
+    {'name': 'full', 'particles': None, 'overlays': True, 'hud_interval_ms': 0},
+    {'name': 'few particles', 'particles': PARTICLE_CAP, 'overlays': True, 'hud_interval_ms': 0},
+    {'name': 'no particles', 'particles': 0, 'overlays': True, 'hud_interval_ms': 0},
+    {'name': 'no overlays', 'particles': 0, 'overlays': False, 'hud_interval_ms': 0},
+    {'name': 'slow HUD', 'particles': 0, 'overlays': False, 'hud_interval_ms': SLOW_HUD_MS},
+)
+
+
+class QualityGovernor:
+    def __init__(self, budget_ms, level=0, adaptive=True, levels=QUALITY_LEVELS):
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.level = level
+        self.quality = levels[level]
+        self.adaptive = adaptive
+        self.frame_ms = array('d', bytes(8 * HISTORY))  # Ring of recent frame work times
+        self.frames = 0
+        self.since_change = 0
+        self.calm = 0  # Consecutive frames with the window under STEP_UP
+        self.recover_frames = RECOVER_FRAMES
+        self.stepped_up = False  # Last change was a step up
+        self.step_downs = 0
+        self.step_ups = 0
+        self.frames_at_level = [0] * len(levels)
+        self.changes = []  # (frame, new level)
+
+    def end_frame(self, work_ms):
+        """Record one frame's work time and adjust the level; returns True if it changed."""
+        self.frame_ms[self.frames % HISTORY] = work_ms
+        self.frames += 1
+        self.since_change += 1
+        self.frames_at_level[self.level] += 1
+        if self.stepped_up and self.since_change == self.recover_frames:
+            self.recover_frames = max(RECOVER_FRAMES, self.recover_frames // 2)  # The step up held
+        if not self.adaptive or self.since_change < WINDOW:
+            return False
+
+        window = sorted(self.frame_ms[(self.frames - n) % HISTORY] for n in range(1, WINDOW + 1))
+        slow = percentile(window, 0.9)
+        if slow > STEP_DOWN * self.budget_ms:
+            if self.level + 1 < len(self.levels):
+                if self.stepped_up and self.since_change < self.recover_frames:
+                    self.recover_frames = min(2 * self.recover_frames, MAX_RECOVER_FRAMES)
+                self.step_downs += 1
+                self.set_level(self.level + 1)
+                self.stepped_up = False
+                return True
+            self.calm = 0
+        elif slow < STEP_UP * self.budget_ms:
+            self.calm += 1
+            if self.calm >= self.recover_frames and self.level > 0:
+                self.step_ups += 1
+                self.set_level(self.level - 1)
+                self.stepped_up = True
+                return True
+        else:
+            self.calm = 0
+        return False
+
+    def set_level(self, level):
+        self.level = level
+        self.quality = self.levels[level]
+        self.since_change = 0
+        self.calm = 0
+        self.changes.append((self.frames, level))
+
+    def stats(self):
+        """Current level and frame work-time percentiles (ms) over the last HISTORY frames."""
+        count = min(self.frames, HISTORY)
+        ordered = sorted(self.frame_ms[:count]) or [0.0]
+        return {
+            'level': self.level,
+            'name': self.quality['name'],
+            'budget_ms': self.budget_ms,
+            'frames': self.frames,
+            'p50': percentile(ordered, 0.5),
+            'p95': percentile(ordered, 0.95),
+            'max': ordered[-1],
+            'step_downs': self.step_downs,
+            'step_ups': self.step_ups,
+            'recover_frames': self.recover_frames,
+            'frames_at_level': list(self.frames_at_level),
+        }
@@ -0,0 +1,201 @@
+"""
+Compact binary replays.
+
+A replay stores the board size, the piece RNG seed and every action
+applied to the engine (moves, rotations, drops, gravity ticks, pause and
+restart), each as a
+varint millisecond delta followed by one action byte. The file ends with
+the final score, lines and a board hash so playback can be verified.
+
+    python tetris.py --record game.trp
+    python replay.py play game.trp              # real time, rendered
+    python replay.py verify replays/*.trp       # headless, as fast as possible
+
+Layout: b'TRPL', version byte, seed (u64 LE), width (u8), height (u16 LE),
+events, END byte, varint score, varint lines, 8-byte board hash.
+"""
+import argparse
+import hashlib
+import random
+import struct
+import sys
+import time
+
+from engine import GRID_WIDTH, GRID_HEIGHT, TetrisEngine
+
+MAGIC = b'TRPL'
+VERSION = 3  # 2: per-turn SRS kicks and the counter-clockwise and half-turn actions; 3: board size
+HEADER = struct.Struct('<4sBQBH')
+END = 0xFF
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def board_hash(engine):
+    return hashlib.blake2b(engine.board_bytes(), digest_size=8).digest()
+
+
+class ReplayRecorder:
+    """Attach to an engine as `engine.recorder` to capture every action."""
+
+    def __init__(self, seed, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.seed = seed
+        self.data = bytearray(HEADER.pack(MAGIC, VERSION, seed, width, height))
+        self.last_time = None
+
+    def record(self, time_ms, action):
+        time_ms = int(time_ms)
+        delta = 0 if self.last_time is None else max(0, time_ms - self.last_time)
+        self.last_time = time_ms
+        write_varint(self.data, delta)
+        self.data.append(action)
+
+    def finish(self, engine):
+        data = bytearray(self.data)
+        write_varint(data, 0)
+        data.append(END)
+        write_varint(data, engine.score)
+        write_varint(data, engine.lines_cleared)
+        data += board_hash(engine)
+        return bytes(data)
+
+    def save(self, path, engine):
+        with open(path, 'wb') as f:
+            f.write(self.finish(engine))
+
+
+class Replay:
+    def __init__(self, seed, events, score, lines, board, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.events = events  # list of (time_ms, action), times relative to the first event
+        self.score = score
+        self.lines = lines
+        self.board = board
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, data):
+        magic, version, seed, width, height = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a Tetris replay (or unsupported version)")
+        pos = HEADER.size
+        events = []
+        now = 0
+        while True:
+            delta, pos = read_varint(data, pos)
+            action = data[pos]
+            pos += 1
+            if action == END:
+                break
+            now += delta
+            events.append((now, action))
+        score, pos = read_varint(data, pos)
+        lines, pos = read_varint(data, pos)
+        board = bytes(data[pos:pos + 8])
+        return cls(seed, events, score, lines, board, width, height)
+
+    def matches(self, engine):
+        return (engine.score == self.score and engine.lines_cleared == self.lines
+                and board_hash(engine) == self.board)
+
+
+def play_headless(replay, engine_class=TetrisEngine):
+    """Re-run a replay with no rendering and no frame throttle; returns the engine."""
+    clock = [0]
+    engine = engine_class(clock=lambda: clock[0], rng=random.Random(replay.seed), width=replay.width,
+                          height=replay.height)
+    apply_action = engine.apply_action
+    for time_ms, action in replay.events:
+        clock[0] = time_ms
+        apply_action(action)
+        engine.events.clear()
+    return engine
+
+
+def play_realtime(replay):
+    """Show a replay in a window at the recorded pace; returns the engine."""
+    import pygame
+    from tetris import Tetris
+
+    clock = [0]
+    engine = TetrisEngine(clock=lambda: clock[0], rng=random.Random(replay.seed), width=replay.width,
+                          height=replay.height)
+    game = Tetris(engine=engine)
+    start = time.perf_counter()
+    index = 0
+    while index < len(replay.events):
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        now = (time.perf_counter() - start) * 1000
+        # Gravity comes from the recorded ticks, never from the live clock
+        while index < len(replay.events) and replay.events[index][0] <= now:
+            clock[0], action = replay.events[index]
+            engine.apply_action(action)
+            index += 1
+        game.process_engine_events()
+        game.update_particles()
+        game.draw()
+        game.clock.tick(60)
+    pygame.quit()
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back and verify Tetris replays")
+    sub = parser.add_subparsers(dest='command', required=True)
+    play = sub.add_parser('play', help="show a replay at real time")
+    play.add_argument('path')
+    play.add_argument('--headless', action='store_true', help="skip rendering and run at full speed")
+    verify = sub.add_parser('verify', help="check replays headless at full speed")
+    verify.add_argument('paths', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'play':
+        replay = Replay.load(args.path)
+        engine = play_headless(replay) if args.headless else play_realtime(replay)
+        ok = replay.matches(engine)
+        print(f"score {engine.score} lines {engine.lines_cleared}: {'match' if ok else 'MISMATCH'}")
+        return 0 if ok else 1
+
+    failures = 0
+    actions = 0
+    start = time.perf_counter()
+    for path in args.paths:
+        replay = Replay.load(path)
+        engine = play_headless(replay)
+        actions += len(replay.events)
+        if not replay.matches(engine):
+            failures += 1
+            print(f"MISMATCH {path}: score {engine.score} (recorded {replay.score}), "
+                  f"lines {engine.lines_cleared} (recorded {replay.lines})")
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.paths) - failures}/{len(args.paths)} replays match, "
+          f"{actions / elapsed if elapsed else 0:,.0f} actions/s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Binary savestates.
+
+A savestate captures everything needed to carry on a game exactly where it
+was: the board, the falling and next pieces, the counters, the gravity
+phase and the piece RNG. It is written into a caller-owned bytearray that
+can be reused for every snapshot, and read back from any buffer (bytes,
+bytearray, memoryview, mmap) without copying it first. For a
+BitboardEngine both directions are a handful of struct calls and one
+memory copy of the color bytes.
+
+    buffer = bytearray()
+    view = save_state(engine, buffer)      # memoryview of the snapshot
+    load_state(engine, view)               # resume, or fork into another engine
+
+Snapshots streamed to spectators should leave out the RNG state
+(`rng=False`), which would otherwise reveal the coming pieces.
+
+Layout (little endian): HEADER, then `height` u64 occupancy rows (bit x is
+column x), `width * height` color ids (see engine.PALETTE), `height` u8
+row fill counts, `width` u16 column tops, and if flagged the Mersenne
+Twister state: 625 u32 words and the cached gauss value (f64).
+"""
+import random
+import struct
+
+from engine import SHAPES, COLORS, SHAPE_NAMES, PIECE_IDS, PALETTE
+from bitboard import BitboardEngine
+
+MAGIC = b'TSAV'
+VERSION = 1
+
+FLAG_GAME_OVER = 1
+FLAG_PAUSED = 2
+FLAG_RNG = 4
+FLAG_GAUSS = 8
+
+# magic, version, flags, width, height, level, score, lines, pieces, board version,
+# drop speed, stack top, ms since the last gravity step, then
+# (name id, x, y, rotation) for the current and the next piece
+HEADER = struct.Struct('<4sBBBHHQIIIHHdBbhBBbhB')
+RNG_WORDS = 625
+RNG_STATE = struct.Struct(f'<{RNG_WORDS}Id')
+
+_layouts = {}
+
+
+def layout(width, height):
+    """(size without RNG, rows struct, column tops struct) for a board size."""
+    key = (width, height)
+    if key not in _layouts:
+        size = HEADER.size + 8 * height + width * height + height + 2 * width
+        _layouts[key] = (size, struct.Struct(f'<{height}Q'), struct.Struct(f'<{width}H'))
+    return _layouts[key]
+
+
+def state_size(width, height, rng=True):
+    return layout(width, height)[0] + (RNG_STATE.size if rng else 0)
+
+
+def _piece_fields(piece):
+    return PIECE_IDS[piece['name']], piece['x'], piece['y'], piece['rotation']
+
+
+def _make_piece(name_id, x, y, rotation):
+    name = SHAPE_NAMES[name_id]
+    return {'shape': SHAPES[name], 'color': COLORS[name], 'x': x, 'y': y,
+            'rotation': rotation, 'name': name}
+
+
+def save_state(engine, buffer=None, rng=True):
+    """
+    Write a savestate of `engine` into `buffer` (a bytearray, grown if it is
+    too small; a new one if None) and return a memoryview of the snapshot.
+    The view is only valid until the buffer is written again.
+    """
+    width, height = engine.width, engine.height
+    base_size, rows_struct, tops_struct = layout(width, height)
+    getstate = getattr(engine.rng, 'getstate', None) if rng else None
+    size = base_size + (RNG_STATE.size if getstate else 0)
+    if buffer is None:
+        buffer = bytearray(size)
+    elif len(buffer) < size:
+        buffer.extend(bytes(size - len(buffer)))
+
+    flags = ((FLAG_GAME_OVER if engine.game_over else 0) | (FLAG_PAUSED if engine.paused else 0)
+             | (FLAG_RNG if getstate else 0))
+    rng_state = getstate() if getstate else None
+    if rng_state is not None and rng_state[2] is not None:
+        flags |= FLAG_GAUSS
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, flags, width, height, engine.level, engine.score,
+                     engine.lines_cleared, engine.pieces_placed, engine.board_version,
+                     engine.drop_speed, engine.stack_top, engine.clock() - engine.last_drop_time,
+                     *_piece_fields(engine.current_piece), *_piece_fields(engine.next_piece))
+
+    offset = HEADER.size
+    cells = width * height
+    if isinstance(engine, BitboardEngine):
+        rows_struct.pack_into(buffer, offset, *engine.rows)
+        buffer[offset + 8 * height:offset + 8 * height + cells] = engine.colors
+    else:
+        rows_struct.pack_into(buffer, offset, *(sum(1 << x for x, color in enumerate(row) if color)
+                                                for row in engine.grid))
+        buffer[offset + 8 * height:offset + 8 * height + cells] = engine.board_bytes()
+    offset += 8 * height + cells
+    buffer[offset:offset + height] = bytes(engine.row_fill)
+    offset += height
+    tops_struct.pack_into(buffer, offset, *engine.column_top)
+    offset += tops_struct.size
+
+    if rng_state is not None:
+        RNG_STATE.pack_into(buffer, offset, *rng_state[1], rng_state[2] or 0.0)
+    return memoryview(buffer)[:size]
+
+
+def load_state(engine, data):
+    """
+    Restore `engine` from a savestate in any buffer. The engine keeps its
+    clock and recorder; its board is resized if the snapshot's differs, and
+    its RNG is restored when the snapshot has one and the engine's RNG can
+    take it (random.Random or the random module).
+    """
+    fields = HEADER.unpack_from(data, 0)
+    magic, version, flags, width, height = fields[:5]
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a Tetris savestate (or unsupported version)")
+    (engine.level, engine.score, engine.lines_cleared, engine.pieces_placed, engine.board_version,
+     engine.drop_speed, stack_top, elapsed) = fields[5:13]
+    if (width, height) != (engine.width, engine.height):
+        engine.width, engine.height = width, height
+        engine.clear_board()
+    base_size, rows_struct, tops_struct = layout(width, height)
+
+    offset = HEADER.size
+    cells = width * height
+    colors = memoryview(data)[offset + 8 * height:offset + 8 * height + cells]
+    if isinstance(engine, BitboardEngine):
+        engine.rows = list(rows_struct.unpack_from(data, offset))
+        engine.colors[:] = colors
+    else:
+        engine.grid = [[PALETTE[c] for c in colors[y * width:(y + 1) * width]] for y in range(height)]
+    offset += 8 * height + cells
+    engine.row_fill = list(data[offset:offset + height])
+    offset += height
+    engine.column_top = list(tops_struct.unpack_from(data, offset))
+    offset += tops_struct.size
+    engine.stack_top = stack_top
+
+    engine.current_piece = _make_piece(*fields[13:17])
+    engine.next_piece = _make_piece(*fields[17:21])
+    engine.game_over = bool(flags & FLAG_GAME_OVER)
+    engine.paused = bool(flags & FLAG_PAUSED)
+    engine.last_drop_time = engine.clock() - elapsed
+    engine.ghost_piece = None
+    engine.events.clear()
+
+    setstate = getattr(engine.rng, 'setstate', None)
+    if flags & FLAG_RNG and setstate is not None:
+        state = RNG_STATE.unpack_from(data, offset)
+        setstate((3, state[:RNG_WORDS], state[RNG_WORDS] if flags & FLAG_GAUSS else None))
+    return engine
+
+
+def fork(engine, buffer=None):
+    """A new engine of the same kind in the same state, with its own RNG, for search."""
+    clone = type(engine)(clock=engine.clock, rng=random.Random(), width=engine.width, height=engine.height)
+    return load_state(clone, save_state(engine, buffer))
+
+
+def save_file(path, engine):
+    with open(path, 'wb') as f:
+        f.write(save_state(engine))
+
+
+def load_file(path, engine):
+    with open(path, 'rb') as f:
+        return load_state(engine, f.read())
@@ -0,0 +1,190 @@
+"""
+High-score store backed by SQLite in WAL mode.
+
+Every finished game is kept with its metadata (player, score, lines,
+level, pieces, date, duration). Indexes on score and on (player, score)
+keep top-N and per-player queries to a short index scan however many
+games are stored. Writes go through a queue to a background thread that
+commits them in transactions, so saving a score never blocks the game
+loop and a crash can't leave a half-written file behind. A legacy
+high_scores.json (a bare list of integers) is imported once on first open.
+
+    python scores.py top -n 10
+    python scores.py top --player alice
+"""
+import argparse
+import getpass
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+SCORE_DB = "high_scores.db"
+LEGACY_SCORE_FILE = "high_scores.json"
+FIELDS = ('player', 'score', 'lines', 'level', 'pieces', 'played_at', 'duration')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    player TEXT,
+    score INTEGER NOT NULL,
+    lines INTEGER,
+    level INTEGER,
+    pieces INTEGER,
+    played_at REAL NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, score DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def default_player():
+    try:
+        return getpass.getuser()
+    except Exception:  # No login name available (e.g. some containers)
+        return 'player'
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, never corrupt
+    return conn
+
+
+class ScoreStore:
+    def __init__(self, path=SCORE_DB, legacy_path=LEGACY_SCORE_FILE):
+        self.path = path
+        self.conn = connect(path)  # Read connection for the thread that opened the store
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        if legacy_path:
+            self.migrate_json(legacy_path)
+
+        self.pending = queue.Queue()
+        self.errors = []  # sqlite errors from the writer; those batches weren't saved
+        self.writer = threading.Thread(target=self.write_loop, name='score-writer', daemon=True)
+        self.writer.start()
+
+    def migrate_json(self, legacy_path):
+        # One-time import; the old file is left in place untouched
+        done = self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone()
+        if done or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path) as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            legacy = []  # A corrupt legacy file has nothing to recover
+        played_at = os.path.getmtime(legacy_path)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO scores (score, played_at) VALUES (?, ?)",
+                [(int(score), played_at) for score in legacy if isinstance(score, (int, float))])
+            self.conn.execute("INSERT INTO meta VALUES ('migrated_json', ?)", (legacy_path,))
+
+    # --- Writing ---
+
+    def add(self, score, player=None, lines=None, level=None, pieces=None, played_at=None, duration=None):
+        """Queue one game for the background writer; returns its row as saved."""
+        entry = {
+            'player': player,
+            'score': score,
+            'lines': lines,
+            'level': level,
+            'pieces': pieces,
+            'played_at': played_at if played_at is not None else time.time(),
+            'duration': duration,
+        }
+        self.pending.put(entry)
+        return entry
+
+    def write_loop(self):
+        try:
+            conn = connect(self.path)
+        except sqlite3.Error as error:
+            conn = None
+            self.report(error)
+        while True:
+            batch = [self.pending.get()]
+            # Commit everything already queued in the same transaction
+            while True:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                if entries and conn is not None:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO scores ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                            [tuple(entry[field] for field in FIELDS) for entry in entries])
+            except sqlite3.Error as error:
+                self.report(error)  # Locked or full: this batch is lost, but the writer keeps going
+            finally:
+                # Always, so flush() and close() can't wait forever on a failed batch
+                for _ in batch:
+                    self.pending.task_done()
+            if len(entries) < len(batch):
+                if conn is not None:
+                    conn.close()
+                return
+
+    def report(self, error):
+        self.errors.append(error)
+        print(f"scores: could not save to {self.path}: {error}", file=sys.stderr)
+
+    def flush(self):
+        """Block until every queued score is committed (or has failed, see `errors`)."""
+        self.pending.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+        self.conn.close()
+
+    # --- Queries ---
+
+    def _rows(self, sql, args):
+        cursor = self.conn.execute(sql, args)
+        return [dict(zip(FIELDS, row)) for row in cursor]
+
+    def top(self, n=5):
+        return self._rows(f"SELECT {', '.join(FIELDS)} FROM scores ORDER BY score DESC LIMIT ?", (n,))
+
+    def top_for_player(self, player, n=5):
+        return self._rows(f"SELECT {', '.join(FIELDS)} FROM scores WHERE player = ? "
+                          f"ORDER BY score DESC LIMIT ?", (player, n))
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the Tetris high-score store")
+    parser.add_argument('--db', default=SCORE_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    top = sub.add_parser('top', help="best games, overall or for one player")
+    top.add_argument('-n', type=int, default=10)
+    top.add_argument('--player')
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(args.db, legacy_path=None)
+    rows = store.top_for_player(args.player, args.n) if args.player else store.top(args.n)
+    for i, row in enumerate(rows):
+        date = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['played_at']))
+        print(f"{i + 1:3}. {row['score']:8}  {row['player'] or '-':12} "
+              f"{row['lines'] if row['lines'] is not None else '-':>5} lines  {date}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
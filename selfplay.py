@@ -0,0 +1,150 @@
+"""
+Run many headless games across a process pool and summarise the results.
+
+    python selfplay.py --games 1000 --policy random
+    python selfplay.py --games 200 --policy mybots:make_policy --workers 4
+
+A policy is a factory `make_policy(rng)` returning `policy(engine) -> action`;
+built-in names are listed in POLICIES, anything else is `module:attribute`.
+Every game is fully determined by its seed: pieces come from
+random.Random(seed) and the policy gets its own generator derived from the
+seed, so results do not depend on the worker count or scheduling order.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+import bot
+from engine import ACTIONS, TetrisEngine, fixed_clock
+
+
+def random_policy(rng):
+    return lambda engine: rng.choice(ACTIONS)
+
+
+POLICIES = {
+    'random': random_policy,
+    'bot': bot.make_policy,
+}
+
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, attribute = name.partition(':')
+    return getattr(importlib.import_module(module_name), attribute or 'make_policy')
+
+
+def play_game(seed, policy_name, max_pieces=10000, gravity_interval=1):
+    """Play one game to the end (or max_pieces) and return its result dict."""
+    start = time.perf_counter()
+    engine = TetrisEngine(clock=fixed_clock, rng=random.Random(seed))
+    policy = load_policy(policy_name)(random.Random(f"policy:{seed}"))
+    steps = 0
+    while not engine.game_over and engine.pieces_placed < max_pieces:
+        engine.apply_action(policy(engine))
+        steps += 1
+        if steps % gravity_interval == 0 and not engine.game_over:
+            engine.tick()
+        engine.events.clear()
+    return {
+        'seed': seed,
+        'score': engine.score,
+        'lines': engine.lines_cleared,
+        'level': engine.level,
+        'pieces': engine.pieces_placed,
+        'steps': steps,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def _play(args):
+    return play_game(*args)
+
+
+def run_games(seeds, policy_name, workers=None, max_pieces=10000, gravity_interval=1):
+    """Yield result dicts as games finish, in completion order."""
+    jobs = [(seed, policy_name, max_pieces, gravity_interval) for seed in seeds]
+    if workers == 1:
+        for job in jobs:
+            yield _play(job)
+        return
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_play, jobs, chunksize):
+            yield result
+
+
+def results_digest(results):
+    """Hash of the deterministic fields, ordered by seed."""
+    digest = hashlib.sha256()
+    for result in sorted(results, key=lambda r: r['seed']):
+        digest.update(json.dumps([result['seed'], result['score'], result['lines'],
+                                  result['level'], result['pieces'], result['steps']]).encode())
+    return digest.hexdigest()
+
+
+def summarize(results):
+    summary = {'games': len(results), 'digest': results_digest(results)}
+    for key in ('score', 'lines', 'level', 'pieces', 'wall_time'):
+        values = [r[key] for r in results]
+        if not values:
+            summary[key] = None  # No games to summarise
+            continue
+        summary[key] = {
+            'mean': statistics.fmean(values),
+            'median': statistics.median(values),
+            'stdev': statistics.pstdev(values),
+            'min': min(values),
+            'max': max(values),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Tetris self-play harness")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--policy', default='random')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-pieces', type=int, default=10000)
+    parser.add_argument('--gravity-interval', type=int, default=1,
+                        help="policy actions per gravity tick")
+    parser.add_argument('--results', help="write one JSON line per game to this file")
+    args = parser.parse_args(argv)
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    out = open(args.results, 'w') if args.results else None
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in run_games(seeds, args.policy, args.workers,
+                                args.max_pieces, args.gravity_interval):
+            results.append(result)
+            if out:
+                out.write(json.dumps(result) + "\n")
+            print(f"\r{len(results)}/{args.games} games", end='', file=sys.stderr)
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+
+    summary = summarize(results)
+    summary['elapsed'] = elapsed
+    summary['games_per_second'] = len(results) / elapsed if elapsed else 0.0
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
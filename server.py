@@ -0,0 +1,402 @@
+"""
+Versus server: many two-player matches on one asyncio event loop.
+
+Every match is simulated on the server from the players' inputs; a single
+scheduler task ticks all matches at a fixed rate, so there is no thread or
+task per client. State goes out at a lower send rate, with matches
+staggered across ticks, since socket writes cost more than simulating.
+Clients are paired in the order they connect, and when a match ends both
+players go back into the queue for the next one.
+
+Clients send one byte per input action (engine.ACTION_LEFT ..
+ACTION_HARD_DROP, ACTION_ROTATE_CCW, ACTION_ROTATE_180); at most
+MAX_QUEUED_INPUTS wait per player, and older ones are dropped past that.
+The server sends length-prefixed frames (u32 LE length, then a type byte):
+
+    START  'S' player index (u8), width (u8), height (u16)
+    DELTA  'D' player (u8), tick (u32), score (u32), lines (u16),
+           piece (u8, index into SHAPE_NAMES), x (i8), y (i16), rotation (u8),
+           flags (u8, bit 0 = game over), pending garbage (u8),
+           changed row count (u16), then per row: y (u16) + width color ids
+    END    'E' winner index (u8, 0xFF for a draw)
+
+A DELTA for a player goes to both clients only on send ticks where something
+about that player changed, and carries only the rows that differ from what
+was last sent. Clearing 2, 3 or 4 lines sends 1, 2 or 4 garbage rows to
+the opponent (first cancelling garbage still pending against the sender),
+which are pushed in under their stack when they next lock a piece.
+
+    python server.py serve --port 7777
+    python server.py serve --unix /tmp/tetris.sock
+    python server.py load --matches 1000 --duration 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import struct
+import sys
+import time
+from collections import deque
+
+from engine import (
+    PIECE_IDS,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP, ACTION_ROTATE, ACTION_HARD_DROP,
+    ACTION_ROTATE_CCW, ACTION_ROTATE_180,
+)
+from bitboard import BitboardEngine
+
+TICK_RATE = 60
+SEND_RATE = 30  # Delta frames per second per match; changes in between are merged
+MAX_INPUTS_PER_TICK = 8  # Per player; anything beyond waits for the next tick
+MAX_QUEUED_INPUTS = 4 * MAX_INPUTS_PER_TICK  # Per player; a flooding client loses its oldest inputs
+MAX_WRITE_BUFFER = 1 << 20  # Clients that stop reading are dropped past this
+GARBAGE_LINES = {1: 0, 2: 1, 3: 2, 4: 4}
+PLAYER_ACTIONS = frozenset((ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP, ACTION_ROTATE, ACTION_HARD_DROP,
+                            ACTION_ROTATE_CCW, ACTION_ROTATE_180))
+DRAW = 0xFF
+
+FRAME = struct.Struct('<I')
+START = struct.Struct('<cBBH')
+DELTA = struct.Struct('<cBIIHBbhBBBH')
+ROW = struct.Struct('<H')
+END = struct.Struct('<cB')
+
+
+def frame(payload):
+    return FRAME.pack(len(payload)) + payload
+
+
+class Player(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.match = None
+        self.index = 0
+        self.inputs = deque(maxlen=MAX_QUEUED_INPUTS)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.join(self)
+
+    def data_received(self, data):
+        if self.match is not None:
+            self.inputs.extend(action for action in data if action in PLAYER_ACTIONS)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.server.leave(self)
+
+    def send(self, data):
+        transport = self.transport
+        if transport is None:
+            return
+        if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            transport.close()
+            return
+        transport.write(data)
+
+
+class Seat:
+    """One side of a match: the player's engine and what its client last saw."""
+
+    def __init__(self, player, seed, clock):
+        self.player = player
+        self.engine = BitboardEngine(clock=clock, rng=random.Random(seed))
+        self.sent_board = bytes(len(self.engine.colors))
+        self.sent_state = None
+        self.garbage = 0  # Rows owed to this player, added on their next lock
+        self.dirty = True  # Something may have changed since the last delta
+
+
+class Match:
+    def __init__(self, players, seed, clock, phase=0):
+        # Both players get the same piece sequence
+        self.seats = [Seat(player, seed, clock) for player in players]
+        self.rng = random.Random(seed ^ 0x5EED)
+        self.phase = phase  # Which ticks this match sends on
+        self.over = False
+        for index, seat in enumerate(self.seats):
+            seat.player.match = self
+            seat.player.index = index
+            seat.player.inputs.clear()
+            engine = seat.engine
+            seat.player.send(frame(START.pack(b'S', index, engine.width, engine.height)))
+
+    def step(self, tick, now, send):
+        """
+        Advance both players one tick, sending deltas if `send`; returns True
+        once the match is decided.
+        """
+        for index, seat in enumerate(self.seats):
+            engine = seat.engine
+            inputs = seat.player.inputs
+            # Most ticks a player neither pressed anything nor is due a gravity step
+            if not inputs and now - engine.last_drop_time <= engine.drop_speed:
+                continue
+            seat.dirty = True
+            opponent = self.seats[1 - index]
+            for _ in range(min(len(inputs), MAX_INPUTS_PER_TICK)):
+                engine.apply_action(inputs.popleft())
+            engine.update()
+            locked = False
+            for name, data in engine.drain_events():
+                if name == 'clear':
+                    attack = GARBAGE_LINES.get(len(data), 4)
+                    cancelled = min(attack, seat.garbage)
+                    seat.garbage -= cancelled
+                    opponent.garbage += attack - cancelled
+                    opponent.dirty = True
+                elif name == 'drop':
+                    locked = True
+            if locked and seat.garbage and not engine.game_over:
+                engine.add_garbage(seat.garbage, self.rng.randrange(engine.width))
+                seat.garbage = 0
+
+        lost = [seat.engine.game_over for seat in self.seats]
+        if send or True in lost:
+            deltas = b''.join([self.delta(index, seat, tick)
+                               for index, seat in enumerate(self.seats) if seat.dirty])
+            if deltas:
+                for seat in self.seats:
+                    seat.player.send(deltas)
+        if True in lost:
+            winner = DRAW if all(lost) else lost.index(False)
+            self.finish(winner)
+        return self.over
+
+    def delta(self, index, seat, tick):
+        seat.dirty = False
+        engine = seat.engine
+        piece = engine.current_piece
+        state = (piece['name'], piece['x'], piece['y'], piece['rotation'], engine.score,
+                 engine.lines_cleared, engine.game_over, seat.garbage, engine.board_version)
+        if state == seat.sent_state:
+            return b''
+        rows = []
+        if seat.sent_state is None or state[-1] != seat.sent_state[-1]:
+            width = engine.width
+            board = engine.board_bytes()
+            sent = seat.sent_board
+            for y in range(engine.height):
+                start = y * width
+                if board[start:start + width] != sent[start:start + width]:
+                    rows.append(ROW.pack(y) + board[start:start + width])
+            seat.sent_board = board
+        seat.sent_state = state
+        payload = DELTA.pack(b'D', index, tick, engine.score, min(engine.lines_cleared, 0xFFFF),
+                             PIECE_IDS[piece['name']], piece['x'], piece['y'], piece['rotation'],
+                             int(engine.game_over), min(seat.garbage, 0xFF), len(rows))
+        return frame(payload + b''.join(rows))
+
+    def finish(self, winner):
+        self.over = True
+        for seat in self.seats:
+            seat.player.send(frame(END.pack(b'E', winner)))
+            seat.player.match = None
+
+    def abandon(self, player):
+        # The other player wins by default
+        self.finish(1 - player.index)
+
+
+class VersusServer:
+    def __init__(self, tick_rate=TICK_RATE, send_rate=SEND_RATE, seed=None):
+        self.tick_ms = 1000 / tick_rate
+        self.send_every = max(1, round(tick_rate / send_rate))
+        self.tick = 0
+        self.rng = random.Random(seed)
+        self.waiting = deque()
+        self.matches = set()
+        self.tick_times = deque(maxlen=1000)  # Seconds spent simulating each recent tick
+        self.missed = 0  # Ticks that finished after the next one was due
+        self.matches_played = 0
+
+    def clock(self):
+        # Every engine runs on simulated time, so gravity is exact whatever the load
+        return self.tick * self.tick_ms
+
+    def join(self, player):
+        self.waiting.append(player)
+        self.pair()
+
+    def leave(self, player):
+        if player in self.waiting:
+            self.waiting.remove(player)
+        if player.match is not None:
+            match = player.match
+            match.abandon(player)
+            self.end(match)
+
+    def pair(self):
+        while len(self.waiting) >= 2:
+            players = (self.waiting.popleft(), self.waiting.popleft())
+            self.matches.add(Match(players, self.rng.getrandbits(32), self.clock,
+                                   self.rng.randrange(self.send_every)))
+
+    def end(self, match):
+        self.matches.discard(match)
+        self.matches_played += 1
+        for seat in match.seats:
+            if seat.player.transport is not None:
+                self.waiting.append(seat.player)
+        self.pair()
+
+    def step(self):
+        self.tick += 1
+        tick, now, send_every = self.tick, self.clock(), self.send_every
+        for match in [match for match in self.matches
+                      if match.step(tick, now, (tick + match.phase) % send_every == 0)]:
+            self.end(match)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        period = self.tick_ms / 1000
+        next_tick = loop.time() + period
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            start = time.perf_counter()
+            self.step()
+            self.tick_times.append(time.perf_counter() - start)
+            next_tick += period
+            if loop.time() > next_tick:
+                # Overran the deadline: count it and re-anchor rather than bunching ticks
+                self.missed += 1
+                next_tick = loop.time() + period
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            times = sorted(self.tick_times)
+            if not times:
+                continue
+            print(f"tick {self.tick}: {len(self.matches)} matches, {len(self.waiting)} waiting, "
+                  f"{self.matches_played} finished, tick p50 {statistics.median(times) * 1000:.2f} ms "
+                  f"p99 {times[int(len(times) * 0.99)] * 1000:.2f} ms "
+                  f"(budget {self.tick_ms:.2f} ms), {self.missed} missed", flush=True)
+
+    async def serve(self, host='127.0.0.1', port=7777, unix=None, report_interval=5.0):
+        loop = asyncio.get_running_loop()
+        if unix:
+            server = await loop.create_unix_server(lambda: Player(self), unix, backlog=4096)
+        else:
+            server = await loop.create_server(lambda: Player(self), host, port, backlog=4096)
+        print(f"serving on {unix or f'{host}:{port}'}", flush=True)
+        async with server:
+            tasks = [asyncio.ensure_future(self.run_ticks())]
+            if report_interval:
+                tasks.append(asyncio.ensure_future(self.report(report_interval)))
+            await asyncio.gather(*tasks)
+
+
+# --- Load generator ---
+
+class LoadClient(asyncio.Protocol):
+    """Plays random inputs at a fixed rate and parses everything the server sends."""
+
+    def __init__(self, stats, rng, actions_per_second):
+        self.stats = stats
+        self.rng = rng
+        self.interval = 1 / actions_per_second
+        self.transport = None
+        self.buffer = bytearray()
+        self.playing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        asyncio.get_running_loop().call_later(self.rng.random() * self.interval, self.act)
+
+    def act(self):
+        if self.transport is None:
+            return
+        if self.playing:
+            self.transport.write(bytes((self.rng.choice((ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE,
+                                                         ACTION_SOFT_DROP, ACTION_HARD_DROP)),)))
+            self.stats['inputs'] += 1
+        asyncio.get_running_loop().call_later(self.interval, self.act)
+
+    def data_received(self, data):
+        self.stats['bytes'] += len(data)
+        buffer = self.buffer
+        buffer += data
+        pos = 0
+        while len(buffer) - pos >= FRAME.size:
+            (length,) = FRAME.unpack_from(buffer, pos)
+            if len(buffer) - pos - FRAME.size < length:
+                break
+            kind = buffer[pos + FRAME.size]
+            if kind == ord('D'):
+                self.stats['deltas'] += 1
+                self.stats['rows'] += DELTA.unpack_from(buffer, pos + FRAME.size)[-1]
+            elif kind == ord('S'):
+                self.playing = True
+                self.stats['starts'] += 1
+            elif kind == ord('E'):
+                self.playing = False
+                self.stats['ends'] += 1
+            pos += FRAME.size + length
+        del buffer[:pos]
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.stats['dropped'] += 1
+
+
+async def run_load(matches, duration, host, port, unix, actions_per_second, seed):
+    loop = asyncio.get_running_loop()
+    stats = dict.fromkeys(('inputs', 'bytes', 'deltas', 'rows', 'starts', 'ends', 'dropped'), 0)
+    rng = random.Random(seed)
+    transports = []
+    for _ in range(matches * 2):
+        def factory(client_rng=random.Random(rng.getrandbits(64))):
+            return LoadClient(stats, client_rng, actions_per_second)
+        if unix:
+            transport, _ = await loop.create_unix_connection(factory, unix)
+        else:
+            transport, _ = await loop.create_connection(factory, host, port)
+        transports.append(transport)
+    print(f"{len(transports)} clients connected", flush=True)
+    start = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - start
+    for transport in transports:
+        transport.close()
+    print(f"{stats['inputs'] / elapsed:,.0f} inputs/s, {stats['deltas'] / elapsed:,.0f} deltas/s "
+          f"({stats['rows'] / max(stats['deltas'], 1):.2f} rows each), "
+          f"{stats['bytes'] / elapsed / 1024:,.0f} KiB/s, {stats['starts']} starts, "
+          f"{stats['ends']} match ends, {stats['dropped']} dropped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetris versus server and load generator")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help="host matches")
+    serve.add_argument('--tick-rate', type=int, default=TICK_RATE, help="simulation ticks per second")
+    serve.add_argument('--send-rate', type=int, default=SEND_RATE, help="state updates per second per match")
+    serve.add_argument('--report', type=float, default=5.0, help="seconds between tick statistics (0 for none)")
+    serve.add_argument('--seed', type=int, help="seed for match piece sequences")
+    load = sub.add_parser('load', help="connect simulated players to a running server")
+    load.add_argument('--matches', type=int, default=1000)
+    load.add_argument('--duration', type=float, default=30.0, help="seconds to play")
+    load.add_argument('--rate', type=float, default=4.0, help="inputs per second per client")
+    load.add_argument('--seed', type=int, default=0)
+    for p in (serve, load):
+        p.add_argument('--host', default='127.0.0.1')
+        p.add_argument('--port', type=int, default=7777)
+        p.add_argument('--unix', metavar='PATH', help="use a Unix socket instead of TCP")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'serve':
+            server = VersusServer(args.tick_rate, args.send_rate, args.seed)
+            asyncio.run(server.serve(args.host, args.port, args.unix, args.report))
+        else:
+            asyncio.run(run_load(args.matches, args.duration, args.host, args.port, args.unix,
+                                 args.rate, args.seed))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
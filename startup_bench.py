@@ -0,0 +1,109 @@
+"""
+Time-to-first-frame benchmark.
+
+Each run launches a fresh interpreter with the SDL dummy video and audio
+drivers, builds a Tetris instance and presents one frame. The time from
+just before the process is spawned until that frame is presented is
+recorded, so interpreter start, imports and subsystem init all count.
+
+    python startup_bench.py --runs 20 --save startup.json
+    python startup_bench.py --runs 20 --baseline startup.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Startup configurations: name -> Tetris keyword arguments
+MODES = {
+    'default': {},
+    'fast': {'fast_startup': True},
+    'fast-no-audio': {'fast_startup': True, 'audio': False},
+}
+
+
+def child(mode):
+    import tetris
+
+    game = tetris.Tetris(**MODES[mode])
+    game.handle_events()
+    game.update()
+    game.draw()
+    presented = time.time()
+    # Finish the deferred work too, so its cost is visible separately
+    game.finish_startup()
+    print(json.dumps({'presented': presented, 'ready': time.time()}))
+
+
+def measure(mode, workdir):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.time()
+    # Run from a scratch directory so the score store isn't created in the checkout
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode],
+                            cwd=workdir, env=env, check=True, capture_output=True, text=True).stdout
+    times = json.loads(output.strip().splitlines()[-1])
+    return times['presented'] - start, times['ready'] - start
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'min': ordered[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetris time-to-first-frame benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--save', help="write results as a JSON baseline")
+    parser.add_argument('--baseline', help="compare medians against a saved baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed relative slowdown before a mode counts as a regression")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child)
+        return 0
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='startup_bench')
+    for mode in args.modes:
+        first_frame, ready = [], []
+        for _ in range(args.runs):
+            presented, done = measure(mode, workdir)
+            first_frame.append(presented)
+            ready.append(done)
+        results[mode] = {'first_frame': summarize(first_frame), 'ready': summarize(ready)}
+        print(f"{mode:15} first frame {results[mode]['first_frame']['median'] * 1000:7.1f} ms"
+              f"  fully loaded {results[mode]['ready']['median'] * 1000:7.1f} ms (median)")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for mode, result in results.items():
+            if mode not in baseline:
+                continue
+            before = baseline[mode]['first_frame']['median']
+            after = result['first_frame']['median']
+            if after > before * (1 + args.threshold):
+                print(f"REGRESSION {mode}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
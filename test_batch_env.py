@@ -0,0 +1,61 @@
+import random
+import unittest
+
+import numpy as np
+
+from batch_env import NUM_PIECES, BatchTetris
+from engine import ACTIONS, ACTION_GRAVITY, SHAPE_NAMES, TetrisEngine, fixed_clock
+
+GAMES = 300
+STEPS = 400
+
+
+class PieceSequence:
+    """Stands in for TetrisEngine's rng, handing out a fixed piece sequence."""
+
+    def __init__(self, pieces):
+        self.pieces = iter(pieces)
+
+    def choice(self, names):
+        return names[next(self.pieces)]
+
+
+class ScriptedBatch(BatchTetris):
+    """BatchTetris drawing each game's pieces from its own sequence."""
+
+    def __init__(self, sequences, **kwargs):
+        self.sequences = [iter(pieces) for pieces in sequences]
+        super().__init__(len(sequences), **kwargs)
+
+    def _draw_pieces(self, games):
+        return [next(self.sequences[game]) for game in games]
+
+
+class BatchEngineTest(unittest.TestCase):
+    def test_batch_matches_engine(self):
+        # Both sides get the same pieces and actions, compared after every step
+        rng = np.random.default_rng(0)
+        sequences = rng.integers(0, NUM_PIECES, (GAMES, 2 * STEPS + 2)).tolist()
+        actions = rng.integers(0, len(ACTIONS), (STEPS, GAMES))
+        batch = ScriptedBatch(sequences, auto_reset=False)
+        engines = [TetrisEngine(clock=fixed_clock, rng=PieceSequence(pieces)) for pieces in sequences]
+        for step in range(STEPS):
+            score, lines, level, game_over = batch.step(np.array(ACTIONS)[actions[step]])
+            for game, engine in enumerate(engines):
+                if not engine.game_over:
+                    engine.apply_action(ACTIONS[actions[step][game]])
+                    if not engine.game_over:
+                        engine.apply_action(ACTION_GRAVITY)
+                context = f"game {game}, step {step}"
+                self.assertEqual((score[game], lines[game], level[game], game_over[game]),
+                                 (engine.score, engine.lines_cleared, engine.level, engine.game_over), context)
+                self.assertEqual(batch.boards[game].tobytes(), engine.board_bytes(), context)
+                if not engine.game_over:
+                    piece = engine.current_piece
+                    self.assertEqual((SHAPE_NAMES[batch.piece[game]], batch.rotation[game], batch.x[game],
+                                      batch.y[game]),
+                                     (piece['name'], piece['rotation'], piece['x'], piece['y']), context)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,13 @@
+import unittest
+
+from bitboard import differential_check
+
+
+class DifferentialTest(unittest.TestCase):
+    def test_bitboard_matches_list_grid(self):
+        # Random games on every CHECK_SIZES board, compared after each action
+        differential_check()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from engine import (
+    SHAPES, SRS_STATES, KICK_TABLE, ROTATE_CW, ROTATE_CCW, ROTATE_180, TetrisEngine, fixed_clock,
+)
+
+# The SRS wall kick tests as published (x right, y up), by (from state,
+# to state) with states 0, R, 2, L numbered 0-3
+SRS_KICKS = {
+    'JLSTZ': {
+        (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+        (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+        (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+        (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+        (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+        (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+        (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+        (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    },
+    'I': {
+        (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+        (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+        (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+        (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+        (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+        (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+        (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+        (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    },
+}
+
+
+def published(name, start, end):
+    """The published tests for a turn between two SRS states, in board coordinates (y down)."""
+    tests = SRS_KICKS['I' if name == 'I' else 'JLSTZ'][start, end]
+    return tuple((x, -y) for x, y in tests)
+
+
+class KickTableTest(unittest.TestCase):
+    def test_quarter_turns_match_srs(self):
+        # Every pair of rotations a quarter turn apart, clockwise and counter-clockwise
+        checked = 0
+        for name, states in SRS_STATES.items():
+            for start, start_state in enumerate(states):
+                for end, end_state in enumerate(states):
+                    if (end_state - start_state) % 4 in (1, 3):
+                        with self.subTest(name=name, start=start, end=end):
+                            self.assertEqual(KICK_TABLE[name][start][end], published(name, start_state, end_state))
+                        checked += 1
+        self.assertEqual(checked, 3 * 8 + 3 * 2)  # J, L, T all round; I, S, Z one pair each
+
+    def test_named_entries(self):
+        self.assertEqual(KICK_TABLE['T'][0][1], ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)))
+        self.assertEqual(KICK_TABLE['T'][0][3], ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)))
+        # The I piece's second rotation is SRS state L
+        self.assertEqual(KICK_TABLE['I'][0][1], ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)))
+        self.assertEqual(KICK_TABLE['I'][1][0], ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1)))
+
+    def test_half_turns(self):
+        # No published kicks: the offset differences between opposite states, repeats dropped
+        self.assertEqual(KICK_TABLE['T'][0][2], ((0, 0),))
+        self.assertEqual(KICK_TABLE['T'][1][3], ((0, 0), (2, 0)))
+        self.assertEqual(KICK_TABLE['J'][3][1], ((0, 0), (-2, 0)))
+        for name in ('I', 'S', 'Z', 'O'):
+            rotation = ROTATE_180 % len(SHAPES[name])
+            self.assertEqual(KICK_TABLE[name][0][rotation], ((0, 0),))
+
+
+class RotateTest(unittest.TestCase):
+    def rotate(self, name, rotation, x, turn):
+        engine = TetrisEngine(clock=fixed_clock)
+        piece = engine.current_piece = {'shape': SHAPES[name], 'name': name, 'color': None,
+                                        'x': x, 'y': 5, 'rotation': rotation}
+        self.assertTrue(engine.rotate_piece(turn))
+        return piece['rotation'], piece['x'], piece['y']
+
+    def test_turns_in_the_open(self):
+        self.assertEqual(self.rotate('T', 0, 2, ROTATE_CW), (1, 2, 5))
+        self.assertEqual(self.rotate('T', 0, 2, ROTATE_CCW), (3, 2, 5))
+        self.assertEqual(self.rotate('T', 0, 2, ROTATE_180), (2, 2, 5))
+
+    def test_wall_kicks(self):
+        # T in state R against the left wall: R->0 and R->L both need a kick right
+        self.assertEqual(self.rotate('T', 1, -1, ROTATE_CCW), (0, 0, 5))
+        self.assertEqual(self.rotate('T', 1, -1, ROTATE_180), (3, 1, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from bitboard import BitboardEngine
+from bot import PlacementBot
+from engine import ACTIONS, ACTION_GRAVITY, ACTION_PAUSE, GRID_WIDTH, GRID_HEIGHT, TetrisEngine
+from replay import Replay, ReplayRecorder, play_headless
+
+
+def record_game(seed, width=GRID_WIDTH, height=GRID_HEIGHT, steps=2000):
+    """
+    Play mostly bot moves with some random ones, a gravity tick after each,
+    and return the replay bytes and the engine.
+    """
+    clock = [0]
+    engine = TetrisEngine(clock=lambda: clock[0], rng=random.Random(seed), width=width, height=height)
+    engine.recorder = ReplayRecorder(seed, width, height)
+    rng = random.Random(f"actions:{seed}")
+    bot = PlacementBot(lookahead=False)
+    for step in range(steps):
+        clock[0] += rng.randrange(40)
+        engine.apply_action(bot.next_action(engine) if rng.random() < 0.9 else rng.choice(ACTIONS))
+        if step == steps // 2:
+            engine.apply_action(ACTION_PAUSE)  # Ignored input while paused, then resume
+            engine.apply_action(rng.choice(ACTIONS))
+            engine.apply_action(ACTION_PAUSE)
+        engine.apply_action(ACTION_GRAVITY)
+    return engine.recorder.finish(engine), engine
+
+
+class ReplayRoundTripTest(unittest.TestCase):
+    def check(self, width, height):
+        data, engine = record_game(3, width, height)
+        replay = Replay.parse(data)
+        self.assertEqual((replay.seed, replay.width, replay.height), (3, width, height))
+        self.assertEqual((replay.score, replay.lines), (engine.score, engine.lines_cleared))
+        for engine_class in (TetrisEngine, BitboardEngine):
+            played = play_headless(replay, engine_class)
+            self.assertEqual((played.width, played.height), (width, height))
+            self.assertEqual(played.board_bytes(), engine.board_bytes())
+            self.assertTrue(replay.matches(played), engine_class.__name__)
+
+    def test_default_board(self):
+        self.check(GRID_WIDTH, GRID_HEIGHT)
+
+    def test_resized_board(self):
+        self.check(10, 20)
+        self.check(17, 60)
+
+    def test_rejects_other_data(self):
+        data, _ = record_game(0, steps=10)
+        with self.assertRaises(ValueError):
+            Replay.parse(b'XXXX' + data[4:])
+        with self.assertRaises(ValueError):
+            Replay.parse(data[:4] + bytes([data[4] - 1]) + data[5:])
+
+
+if __name__ == "__main__":
+    unittest.main()
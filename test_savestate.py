@@ -0,0 +1,105 @@
+import random
+import unittest
+
+from bitboard import BitboardEngine
+from bot import PlacementBot
+from engine import ACTIONS, ACTION_GRAVITY, GRID_WIDTH, GRID_HEIGHT, TetrisEngine, fixed_clock
+from savestate import fork, load_state, save_state
+
+ENGINES = (TetrisEngine, BitboardEngine)
+
+
+def make_engine(engine_class, seed, width=GRID_WIDTH, height=GRID_HEIGHT):
+    return engine_class(clock=fixed_clock, rng=random.Random(seed), width=width, height=height)
+
+
+def play(engine, rng, steps):
+    """Mostly bot moves with some random ones, a gravity tick after each, until game over."""
+    bot = PlacementBot(lookahead=False)
+    for _ in range(steps):
+        if engine.game_over:
+            break
+        engine.apply_action(bot.next_action(engine) if rng.random() < 0.9 else rng.choice(ACTIONS))
+        engine.apply_action(ACTION_GRAVITY)
+        engine.events.clear()
+
+
+def state(engine):
+    return (engine.width, engine.height, engine.board_bytes(), engine.row_fill, engine.column_top,
+            engine.stack_top, engine.score, engine.lines_cleared, engine.level, engine.pieces_placed,
+            engine.board_version, engine.drop_speed, engine.current_piece, engine.next_piece,
+            engine.game_over, engine.paused)
+
+
+class SavestateTest(unittest.TestCase):
+    def played(self, engine_class, width=GRID_WIDTH, height=GRID_HEIGHT, steps=40):
+        engine = make_engine(engine_class, 1, width, height)
+        play(engine, random.Random(2), steps)
+        self.assertFalse(engine.game_over)
+        return engine
+
+    def assert_same_future(self, source, target, steps=300):
+        # Identical actions from here on must give identical games
+        play(source, random.Random(3), steps)
+        play(target, random.Random(3), steps)
+        self.assertEqual(state(target), state(source))
+
+    def test_round_trip_between_engine_kinds(self):
+        for source_class in ENGINES:
+            for target_class in ENGINES:
+                with self.subTest(source=source_class.__name__, target=target_class.__name__):
+                    source = self.played(source_class)
+                    target = load_state(make_engine(target_class, 99), save_state(source))
+                    self.assertEqual(state(target), state(source))
+                    self.assertEqual(target.rng.getstate(), source.rng.getstate())
+                    self.assert_same_future(source, target)
+
+    def test_without_rng_state(self):
+        for engine_class in ENGINES:
+            with self.subTest(engine=engine_class.__name__):
+                source = self.played(engine_class)
+                target = make_engine(engine_class, 99)
+                rng_state = target.rng.getstate()
+                load_state(target, save_state(source, rng=False))
+                self.assertEqual(state(target), state(source))
+                self.assertEqual(target.rng.getstate(), rng_state)
+
+    def test_load_resizes_the_board(self):
+        for width, height in ((10, 20), (17, 9), (5, 200)):
+            for engine_class in ENGINES:
+                with self.subTest(size=(width, height), engine=engine_class.__name__):
+                    source = self.played(engine_class, width, height, steps=10)
+                    target = load_state(make_engine(engine_class, 99), save_state(source))
+                    self.assertEqual(state(target), state(source))
+                    self.assert_same_future(source, target)
+
+    def test_buffer_reuse(self):
+        # A buffer grown for a big board still gives exact snapshots of a smaller one
+        buffer = bytearray()
+        big = self.played(BitboardEngine, 40, 100, steps=10)
+        save_state(big, buffer)
+        small = self.played(TetrisEngine)
+        target = load_state(make_engine(TetrisEngine, 99, 40, 100), save_state(small, buffer))
+        self.assertEqual(state(target), state(small))
+
+    def test_fork(self):
+        for engine_class in ENGINES:
+            with self.subTest(engine=engine_class.__name__):
+                source = self.played(engine_class)
+                before = state(source)
+                clone = fork(source)
+                self.assertIs(type(clone), engine_class)
+                self.assertEqual(state(clone), before)
+                play(clone, random.Random(4), 100)
+                self.assertEqual(state(source), before)
+                self.assert_same_future(source, fork(source))
+
+    def test_rejects_other_data(self):
+        data = bytearray(save_state(self.played(TetrisEngine)))
+        data[:4] = b'XXXX'
+        with self.assertRaises(ValueError):
+            load_state(make_engine(TetrisEngine, 0), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,169 +1,307 @@
+import argparse
 import pygame
 import random
-import time
-import json
 import os
-import math
 from pygame import mixer
-import struct
-import wave
+import time
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # Particles fall back to pure Python
+    np = None
+
+from engine import (
+    GRID_WIDTH, GRID_HEIGHT, PALETTE, COLOR_INDEX, RED,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP, ACTION_ROTATE, ACTION_HARD_DROP,
+    ACTION_PAUSE, ACTION_RESTART, ACTION_ROTATE_CCW, ACTION_ROTATE_180,
+    TetrisEngine,
+)
+from bot import PlacementBot
+from controls import DAS_MS, ARR_MS, InputHandler, now_ms
+from profiler import FrameProfiler
+from scores import SCORE_DB, ScoreStore, default_player
+from replay import ReplayRecorder
+from savestate import save_file, load_file
+from quality import QualityGovernor, QUALITY_LEVELS
+from audio import (
+    SAMPLE_RATE, BITS_PER_SAMPLE, NUM_CHANNELS, AUDIO_BUFFER, LOW_LATENCY_BUFFER, SOUND_EFFECTS,
+    ChannelPool, SoundBank, init_mixer,
+)
 
 # --- Constants ---
 SCREEN_WIDTH = 900
 SCREEN_HEIGHT = 600
-GRID_WIDTH = 8
-GRID_HEIGHT = 14
-BLOCK_SIZE = 35
-GRID_OFFSET_X = (SCREEN_WIDTH - GRID_WIDTH * BLOCK_SIZE) // 2
-GRID_OFFSET_Y = (SCREEN_HEIGHT - GRID_HEIGHT * BLOCK_SIZE) // 2 + 50
-SCORE_FILE = "high_scores.json"
+BLOCK_SIZE = 35  # Largest cell size; bigger boards are drawn smaller
+MIN_BLOCK_SIZE = 4  # Boards too tall for the screen at this size scroll instead
+BOARD_AREA_WIDTH = 400
+BOARD_AREA_HEIGHT = GRID_HEIGHT * BLOCK_SIZE
+HIGH_SCORE_ROWS = 5
+MAX_PARTICLES = 2048
+SIM_RATE = 60  # Fixed simulation steps per second
+MAX_FRAME_MS = 250  # Longest frame fed to the simulation, so stalls don't spiral
+RENDER_MODES = ('capped', 'vsync', 'uncapped')
+VSYNC_PROBE_FLIPS = 5  # Flips timed to check that vsync really paces presents
+PARTICLES_PER_BLOCK = 5
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (50, 50, 50)
 LIGHT_GRAY = (100, 100, 100)
-BLUE = (0, 0, 255)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-YELLOW = (255, 255, 0)
-ORANGE = (255, 165, 0)
-PURPLE = (128, 0, 128)
-CYAN = (0, 255, 255)
-DARK_BLUE = (0, 0, 139)
 BG_COLOR = (10, 10, 10)
 
-# Tetromino shapes (rotated versions of 0 degrees)
-# Each shape is represented by a list of relative coordinates (x, y)
-SHAPES = {
-    'I': [
-        [(0, 1), (1, 1), (2, 1), (3, 1)],  # I
-        [(1, 0), (1, 1), (1, 2), (1, 3)]
-    ],
-    'J': [
-        [(0, 0), (0, 1), (1, 1), (2, 1)],  # J
-        [(1, 0), (2, 0), (1, 1), (1, 2)],
-        [(0, 1), (1, 1), (2, 1), (2, 2)],
-        [(1, 0), (1, 1), (0, 2), (1, 2)]
-    ],
-    'L': [
-        [(2, 0), (0, 1), (1, 1), (2, 1)],  # L
-        [(1, 0), (1, 1), (1, 2), (2, 2)],
-        [(0, 0), (0, 1), (1, 1), (2, 1)],
-        [(0, 0), (1, 0), (1, 1), (1, 2)]
-    ],
-    'O': [
-        [(0, 0), (1, 0), (0, 1), (1, 1)]  # O
-    ],
-    'S': [
-        [(1, 0), (2, 0), (0, 1), (1, 1)],  # S
-        [(0, 0), (0, 1), (1, 1), (1, 2)]
-    ],
-    'T': [
-        [(1, 0), (0, 1), (1, 1), (2, 1)],  # T
-        [(1, 0), (1, 1), (2, 1), (1, 2)],
-        [(0, 1), (1, 1), (2, 1), (1, 2)],
-        [(1, 0), (0, 1), (1, 1), (1, 2)]
-    ],
-    'Z': [
-        [(0, 0), (1, 0), (1, 1), (2, 1)],  # Z
-        [(2, 0), (1, 1), (2, 1), (1, 2)]
-    ]
-}
 
-# Colors for each Tetromino
-COLORS = {
-    'I': CYAN,
-    'J': DARK_BLUE,
-    'L': ORANGE,
-    'O': YELLOW,
-    'S': GREEN,
-    'T': PURPLE,
-    'Z': RED
+class TextCache:
+    """
+    Bounded LRU of rendered text surfaces keyed by (font, text, color).
+    Static strings are rendered once; changing values such as the score
+    only re-render when the text actually changes.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+CONTROL_HINTS = [
+    ("Controls:", 0),
+    ("Left/Right Arrows: Move", 30),
+    ("Down Arrow: Soft Drop", 50),
+    ("Up/X: Rotate Right", 70),
+    ("Z: Rotate Left, C: 180", 90),
+    ("Space: Hard Drop", 110),
+    ("P: Pause", 130),
+    ("R: Restart (Game Over/Paused)", 150),
+    ("H: High Scores (Game Over)", 170),
+    ("A: Toggle AI Player", 190),
+]
+
+
+# Methods timed by --profile, in frame order (grid_tiles and ghost_y run inside draw_board)
+PROFILED_PHASES = (
+    'handle_events', 'update', 'process_engine_events',
+    'draw_board', 'grid_tiles', 'ghost_y', 'draw_next_piece', 'draw_ui', 'draw_particles',
+    'draw_game_over', 'draw_pause', 'draw_high_scores',
+    'present', 'wait_for_next_frame',
+)
+
+# Keys that auto-repeat while held
+HELD_KEYS = {
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_DOWN: ACTION_SOFT_DROP,
 }
 
-# Sound generation parameters
-SAMPLE_RATE = 44100  # samples per second
-BITS_PER_SAMPLE = 16  # 16-bit audio
-NUM_CHANNELS = 1 # Mono audio
 
-def create_simple_sound(filename, duration, frequency, amplitude=0.5):
-    """
-    Creates a simple sine wave sound and saves it to a WAV file.
-    """
-    num_samples = int(duration * SAMPLE_RATE)
-    max_amplitude = 32767 # For 16-bit audio (signed)
-
-    # Generate raw samples as signed 16-bit integers
-    raw_samples = []
-    for i in range(num_samples):
-        value = int(amplitude * max_amplitude * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
-        raw_samples.append(value)
-
-    # Convert samples to a byte string
-    # '<h' means little-endian, signed short (2 bytes)
-    byte_data = b''.join(struct.pack('<h', sample) for sample in raw_samples)
-
-    # Write to WAV file using the wave module
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(NUM_CHANNELS)
-        wf.setsampwidth(BITS_PER_SAMPLE // 8)
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(byte_data)
+def _engine_attr(name):
+    # Game state lives on the engine; expose it on Tetris for the draw code
+    return property(lambda self: getattr(self.engine, name),
+                    lambda self, value: setattr(self.engine, name, value))
 
-class Tetris:
-    def __init__(self):
-        pygame.init()
-        mixer.init(SAMPLE_RATE, -BITS_PER_SAMPLE, NUM_CHANNELS, 4096) # Initialize mixer for sound effects
 
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+class Tetris:
+    grid = _engine_attr('grid')
+    current_piece = _engine_attr('current_piece')
+    next_piece = _engine_attr('next_piece')
+    score = _engine_attr('score')
+    level = _engine_attr('level')
+    lines_cleared = _engine_attr('lines_cleared')
+    drop_speed = _engine_attr('drop_speed')
+    game_over = _engine_attr('game_over')
+    paused = _engine_attr('paused')
+
+    def __init__(self, engine=None, dirty_rects=False, max_particles=MAX_PARTICLES,
+                 sound_cache_dir=None, fast_startup=False, audio=True, seed=None, record=None,
+                 render_mode='capped', fps=60, interpolate=False, sim_rate=SIM_RATE,
+                 das=DAS_MS, arr=ARR_MS, latency_report=False, profile=None,
+                 player=None, score_db=SCORE_DB, width=GRID_WIDTH, height=GRID_HEIGHT, block_size=None,
+                 suspend=None, audio_buffer=AUDIO_BUFFER, dataset=None, quality=None,
+                 quality_report=False):
+        # Fast startup brings up only video and events; fonts, sounds and the
+        # score file are loaded one per frame after the first frame is shown
+        if audio:
+            # pygame.init() opens the mixer too; make it use our buffer size
+            mixer.pre_init(SAMPLE_RATE, -BITS_PER_SAMPLE, NUM_CHANNELS, audio_buffer)
+        if fast_startup:
+            pygame.display.init()
+        elif audio:
+            pygame.init()
+        else:
+            # pygame.init() would open the mixer as well; bring up only what we draw with
+            pygame.display.init()
+            pygame.font.init()
+        self.audio = audio
+        self.audio_buffer = audio_buffer
+        self.channel_pool = None
+
+        # Rendering runs at `fps` (capped), the display refresh (vsync) or as fast
+        # as possible (uncapped); the simulation always steps at sim_rate
+        self.screen = None
+        if render_mode == 'vsync':
+            try:
+                self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED, vsync=1)
+            except pygame.error:
+                render_mode = 'capped'  # No vsync-capable renderer
+            else:
+                if not self.vsync_working():
+                    render_mode = 'capped'  # SDL only warned and gave us an unsynced renderer
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Tetris")
         self.clock = pygame.time.Clock()
+        self.render_mode = render_mode
+        self.fps = fps
+        self.interpolate = interpolate
+        self.step_ms = 1000 / sim_rate
+        self.sim_time = 0.0
+        self.previous_piece = None
+        self.render_offset = 0
+        self.frame_start = now_ms()
+        self.sim_lag = None  # Real time minus simulation time, set by run()
+        self.input = InputHandler(das, arr)
+        self.latency_report = latency_report
+        self.present_ms = 0.0
+
+        # Effects are shed when frames near the budget; quality pins a level instead.
+        # Uncapped frames have no budget to near, so there it only measures.
+        budget_ms = None if render_mode == 'uncapped' else 1000 / fps
+        self.governor = QualityGovernor(budget_ms, level=quality or 0,
+                                        adaptive=quality is None and budget_ms is not None)
+        self.quality_report = quality_report
+        self.hud_values = None  # (score, level, lines, AI stats) as last shown
+        self.hud_refreshed = 0.0
+
+        self.font = None
+        self.big_font = None
+        self.small_font = None
+        self.fonts_ready = False
+        self.text_cache = TextCache()
+        self.controls_panel = None
+        self.modal_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        self.modal_overlay.fill((0, 0, 0, 180))  # Semi-transparent black
+
+        # Pieces come from a seeded generator so a game can be recorded and replayed
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+        self.engine = engine if engine is not None else TetrisEngine(clock=self.sim_clock,
+                                                                     rng=random.Random(self.seed),
+                                                                     width=width, height=height)
+        # Pick up a game suspended on a previous exit (board size included)
+        self.suspend_path = suspend
+        if suspend and os.path.exists(suspend):
+            load_file(suspend, self.engine)
+        self.layout_board(block_size)
+        self.block_tiles = self.build_block_tiles()
+        self.ghost_tile = self.build_ghost_tile()
+        self.grid_background = self.build_grid_background()
+        self.record_path = record
+        self.replay_recorder = None
+        if record:
+            recorder = ReplayRecorder(self.seed, self.engine.width, self.engine.height)
+            self.replay_recorder = self.engine.recorder = recorder
+        # Training transitions go to a dataset directory, alongside any replay
+        self.dataset_recorder = None
+        if dataset:
+            from dataset import TransitionWriter, DatasetRecorder  # Needs numpy
+            writer = TransitionWriter(dataset, self.engine.width, self.engine.height)
+            self.dataset_recorder = self.engine.recorder = DatasetRecorder(writer, self.engine,
+                                                                           forward=self.replay_recorder)
+        self.show_high_scores = False
+        self.high_scores = []  # (score, player, lines), best first
+        self.high_scores_loaded = False
+        self.score_db = score_db
+        self.score_store = None  # Opened with the first high-score load
+        self.player = player or default_player()
+        self.game_started = time.time()
+
+        self.particles = (ParticleSystem if np is not None else ParticleList)(max_particles)
+
+        # AI player, toggled with A; the time budget keeps searches inside a frame
+        self.bot = PlacementBot(time_budget=0.008)
+        self.ai_enabled = False
+
+        # Dirty-rectangle rendering: only redraw and present regions that changed
+        self.dirty_rects = dirty_rects
+        self.full_redraw = True
+        self.last_frame_state = None
+        self.particle_rect = None
+
+        self.sound_bank = SoundBank(sound_cache_dir)
+        self.sounds = {}
+        # REMOVED: self.load_music() - No background music desired
 
+        # Frame profiler (--profile): wraps the phase methods of this instance only
+        self.profile_path = profile
+        self.profiler = None
+        if profile:
+            self.profiler = FrameProfiler()
+            self.profiler.instrument(self, PROFILED_PHASES)
+
+        self.startup_tasks = [self.load_fonts, self.reload_high_scores, self.init_audio]
+        if not fast_startup:
+            self.finish_startup()
+
+    def vsync_working(self, flips=VSYNC_PROBE_FLIPS):
+        # Headless drivers never sync; otherwise a synced flip waits for the display,
+        # so a few flips must take about a refresh period each
+        if pygame.display.get_driver() in ('dummy', 'offscreen'):
+            return False
+        refresh = getattr(pygame.display, 'get_current_refresh_rate', lambda: 0)() or 60
+        self.screen.fill(BG_COLOR)
+        pygame.display.flip()  # The first flip may return at once
+        start = now_ms()
+        for _ in range(flips):
+            pygame.display.flip()
+        return (now_ms() - start) / flips >= 0.5 * 1000 / refresh
+
+    def finish_startup(self):
+        while self.startup_tasks:
+            self.run_startup_task()
+
+    def run_startup_task(self):
+        if self.startup_tasks:
+            self.startup_tasks.pop(0)()
+
+    def load_fonts(self):
+        pygame.font.init()
         self.font = pygame.font.Font(None, 36)
         self.big_font = pygame.font.Font(None, 72)
         self.small_font = pygame.font.Font(None, 24)
+        self.controls_panel = self.build_controls_panel()
+        self.fonts_ready = True
+        self.full_redraw = True
 
-        self.grid = self.create_empty_grid()
-        self.current_piece = self.new_piece()
-        self.next_piece = self.new_piece()
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-        self.drop_speed = 1000  # milliseconds
-        self.last_drop_time = time.time() * 1000
-        self.game_over = False
-        self.paused = False
-        self.show_high_scores = False
+    def reload_high_scores(self):
         self.high_scores = self.load_high_scores()
+        self.high_scores_loaded = True
 
-        self.particles = []
-
+    def init_audio(self):
+        if not self.audio:
+            return
+        init_mixer(self.audio_buffer)
+        self.channel_pool = ChannelPool()
         self.load_sounds()
-        # REMOVED: self.load_music() - No background music desired
 
     def load_sounds(self):
-        # Create sound files if they don't exist
-        self.create_sound_files()
-
-        self.sound_clear = mixer.Sound("clear.wav")
-        self.sound_drop = mixer.Sound("drop.wav")
-        self.sound_gameover = mixer.Sound("gameover.wav")
-        self.sound_move = mixer.Sound("move.wav")
-        self.sound_rotate = mixer.Sound("rotate.wav")
-
-    def create_sound_files(self):
-        # Only create files if they don't exist to avoid re-generating every time
-        if not os.path.exists("clear.wav"):
-            create_simple_sound("clear.wav", 0.1, 880)  # A5 note
-        if not os.path.exists("drop.wav"):
-            create_simple_sound("drop.wav", 0.05, 110)  # A2 note
-        if not os.path.exists("gameover.wav"):
-            create_simple_sound("gameover.wav", 1.0, 55, amplitude=0.7)  # A1 note
-        if not os.path.exists("move.wav"):
-            create_simple_sound("move.wav", 0.05, 220)  # A3 note
-        if not os.path.exists("rotate.wav"):
-            create_simple_sound("rotate.wav", 0.1, 440)  # A4 note
+        # Sounds are synthesized in memory; nothing is written to the working directory
+        self.sounds = {name: self.sound_bank.get(*params) for name, params in SOUND_EFFECTS.items()}
+
+    def play_sound(self, name):
+        sound = self.sounds.get(name)
+        if sound is not None:
+            self.channel_pool.play(name, sound)
 
     # REMOVED: load_music method entirely
     # def load_music(self):
@@ -173,335 +311,281 @@ class Tetris:
     #     mixer.music.set_volume(0.3)
     #     mixer.music.play(-1) # -1 means loop indefinitely
 
-    def create_empty_grid(self):
-        return [['' for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-
-    def new_piece(self):
-        shape_name = random.choice(list(SHAPES.keys()))
-        return {
-            'shape': SHAPES[shape_name],
-            'color': COLORS[shape_name],
-            'x': GRID_WIDTH // 2 - 2,
-            'y': 0,
-            'rotation': 0,
-            'name': shape_name
-        }
-
-    def draw_grid(self):
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                rect = pygame.Rect(GRID_OFFSET_X + x * BLOCK_SIZE,
-                                   GRID_OFFSET_Y + y * BLOCK_SIZE,
-                                   BLOCK_SIZE, BLOCK_SIZE)
-                pygame.draw.rect(self.screen, LIGHT_GRAY, rect, 1)  # Draw grid lines
-
-                # Draw fallen blocks
-                color = self.grid[y][x]
-                if color:
-                    pygame.draw.rect(self.screen, color, rect)
-                    pygame.draw.rect(self.screen, BLACK, rect, 1)  # Block borders
-
-    def draw_piece(self, piece, offset_x=0, offset_y=0):
+    def process_engine_events(self):
+        # Turn the engine's rule events into sounds and particles
+        for name, data in self.engine.drain_events():
+            if name in self.sounds:
+                self.play_sound(name)
+            if name == 'clear':
+                self.create_line_clear_particles(data)
+
+    def layout_board(self, block_size=None):
+        # The largest cell size (up to BLOCK_SIZE) that fits the board area;
+        # boards still too tall show view_rows rows and scroll with the piece
+        width, height = self.engine.width, self.engine.height
+        if block_size is None:
+            block_size = max(MIN_BLOCK_SIZE, min(BLOCK_SIZE, BOARD_AREA_WIDTH // width,
+                                                 BOARD_AREA_HEIGHT // height))
+        if width * block_size > SCREEN_WIDTH:
+            raise ValueError(f"a {width}-column board doesn't fit on screen at {block_size} px per cell")
+        self.block_size = block_size
+        self.view_rows = min(height, BOARD_AREA_HEIGHT // block_size)
+        self.view_top = 0
+        self.grid_offset_x = (SCREEN_WIDTH - width * block_size) // 2
+        self.grid_offset_y = (SCREEN_HEIGHT - self.view_rows * block_size) // 2 + 50
+
+        # Screen regions redrawn independently in dirty-rectangle mode
+        self.board_rect = pygame.Rect(self.grid_offset_x, self.grid_offset_y,
+                                      width * block_size, self.view_rows * block_size)
+        next_x = self.board_rect.right + 50
+        self.next_piece_rect = pygame.Rect(next_x, self.grid_offset_y, SCREEN_WIDTH - next_x,
+                                           40 + 4 * block_size)
+        self.hud_rect = pygame.Rect(0, 0, self.grid_offset_x, 170)
+
+    def scroll_to_piece(self):
+        # Keep the falling piece near the middle of the view on tall boards
+        if self.view_rows >= self.engine.height:
+            return
+        target = self.current_piece['y'] + 2 - self.view_rows // 2
+        self.view_top = max(0, min(self.engine.height - self.view_rows, target))
+
+    def build_block_tiles(self):
+        # One pre-rendered tile per cell color (pieces and garbage): fill plus black border
+        tiles = {}
+        for color in PALETTE[1:]:
+            tile = pygame.Surface((self.block_size, self.block_size))
+            tile.fill(color)
+            pygame.draw.rect(tile, BLACK, tile.get_rect(), 1)
+            tiles[color] = tile
+        return tiles
+
+    def build_ghost_tile(self):
+        tile = pygame.Surface((self.block_size, self.block_size), pygame.SRCALPHA)
+        pygame.draw.rect(tile, (150, 150, 150), tile.get_rect(), 1) # Gray outline
+        return tile
+
+    def build_grid_background(self):
+        # The empty board with its grid lines, blitted once per frame
+        background = pygame.Surface(self.board_rect.size)
+        background.fill(BG_COLOR)
+        size = self.block_size
+        for y in range(self.view_rows):
+            for x in range(self.engine.width):
+                rect = pygame.Rect(x * size, y * size, size, size)
+                pygame.draw.rect(background, LIGHT_GRAY, rect, 1)  # Draw grid lines
+        return background
+
+    def grid_tiles(self):
+        # Locked cells in the visible rows; empty rows are skipped by their fill count
+        tiles = self.block_tiles
+        size = self.block_size
+        engine = self.engine
+        row_fill = engine.row_fill
+        blits = []
+        for y in range(max(self.view_top, engine.stack_top), self.view_top + self.view_rows):
+            if row_fill[y]:
+                screen_y = self.grid_offset_y + (y - self.view_top) * size
+                blits += [(tiles[color], (self.grid_offset_x + x * size, screen_y))
+                          for x, color in enumerate(engine.row_colors(y)) if color]
+        return blits
+
+    def piece_tiles(self, piece, offset_x=0, offset_y=0, y=None, tile=None, first_row=0):
+        # Tiles for the piece's cells that fall inside the board's columns and the
+        # view_rows rows starting at first_row
+        y = piece['y'] if y is None else y
+        tile = tile or self.block_tiles[piece['color']]
+        size = self.block_size
+        last_row = first_row + self.view_rows
+        blits = []
         for x_offset, y_offset in piece['shape'][piece['rotation']]:
             block_x = piece['x'] + x_offset
-            block_y = piece['y'] + y_offset
-            if 0 <= block_x < GRID_WIDTH and 0 <= block_y < GRID_HEIGHT:
-                rect = pygame.Rect(offset_x + block_x * BLOCK_SIZE,
-                                   offset_y + block_y * BLOCK_SIZE,
-                                   BLOCK_SIZE, BLOCK_SIZE)
-                pygame.draw.rect(self.screen, piece['color'], rect)
-                pygame.draw.rect(self.screen, BLACK, rect, 1)
-
-    def draw_ghost_piece(self):
-        ghost_piece = self.current_piece.copy()
-        while self.valid_position(ghost_piece, y_offset=1):
-            ghost_piece['y'] += 1
-
-        # Draw the ghost piece with a transparent or different color
-        for x_offset, y_offset in ghost_piece['shape'][ghost_piece['rotation']]:
-            block_x = ghost_piece['x'] + x_offset
-            block_y = ghost_piece['y'] + y_offset
-            if 0 <= block_x < GRID_WIDTH and 0 <= block_y < GRID_HEIGHT:
-                rect = pygame.Rect(GRID_OFFSET_X + block_x * BLOCK_SIZE,
-                                   GRID_OFFSET_Y + block_y * BLOCK_SIZE,
-                                   BLOCK_SIZE, BLOCK_SIZE)
-                pygame.draw.rect(self.screen, (150, 150, 150), rect, 1) # Gray outline
-
-    def valid_position(self, piece, x_offset=0, y_offset=0, rotation_offset=0):
-        test_rotation = (piece['rotation'] + rotation_offset) % len(piece['shape'])
-        for x_rel, y_rel in piece['shape'][test_rotation]:
-            block_x = piece['x'] + x_rel + x_offset
-            block_y = piece['y'] + y_rel + y_offset
-
-            # Check boundaries
-            if not (0 <= block_x < GRID_WIDTH and 0 <= block_y < GRID_HEIGHT):
-                return False
-            # Check collision with existing blocks in the grid
-            if self.grid[block_y][block_x]:
-                return False
-        return True
-
-    def rotate_piece(self):
-        original_rotation = self.current_piece['rotation']
-        self.current_piece['rotation'] = (self.current_piece['rotation'] + 1) % len(self.current_piece['shape'])
-
-        # Wall kick (simple implementation)
-        kicks = {
-            'I': [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)], # SRS kicks for I
-            'J': [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)], # SRS kicks for JLSTZ
-            'L': [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-            'S': [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-            'T': [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-            'Z': [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-            'O': [(0,0)] # O doesn't rotate relative to its center
-        }
-
-        # Determine which kick set to use based on current and next rotation state
-        # Simplified: using kick data for 0->1, 1->2, 2->3, 3->0 rotation
-        # This is a very basic SRS-like implementation. A full SRS would involve
-        # specific kick tables for each rotation state transition.
-        kick_data_index = original_rotation % 4 if self.current_piece['name'] != 'I' else original_rotation % 2
-
-        kick_offsets = kicks[self.current_piece['name']]
-
-        # Adjust kick attempts based on piece name for different SRS rules
-        if self.current_piece['name'] == 'I':
-            # For I-piece, use 5 kicks specifically for 0->1, 1->0, 1->2, 2->1, 2->3, 3->2
-            # Here we're simplifying, effectively just trying offsets
-            effective_kicks = kick_offsets
-        else:
-            # For JLSTZ, use standard 5 kicks
-            effective_kicks = kick_offsets
-
-
-        for kick_x, kick_y in effective_kicks:
-            if self.valid_position(self.current_piece, x_offset=kick_x, y_offset=kick_y):
-                self.current_piece['x'] += kick_x
-                self.current_piece['y'] += kick_y
-                self.sound_rotate.play()
-                return
+            block_y = y + y_offset
+            if 0 <= block_x < self.engine.width and first_row <= block_y < last_row:
+                blits.append((tile, (offset_x + block_x * size, offset_y + (block_y - first_row) * size)))
+        return blits
+
+    def draw_board(self):
+        # Background blit plus one batched blit for locked cells, ghost and falling piece
+        self.screen.blit(self.grid_background, self.board_rect.topleft)
+        piece = self.current_piece
+        x, y, top = self.grid_offset_x, self.grid_offset_y, self.view_top
+        self.screen.blits(self.grid_tiles()
+                          + self.piece_tiles(piece, x, y, y=self.ghost_y(), tile=self.ghost_tile, first_row=top)
+                          + self.piece_tiles(piece, x, y + self.render_offset, first_row=top),
+                          doreturn=False)
 
-        # If no kick works, revert rotation
-        self.current_piece['rotation'] = original_rotation
+    def draw_piece(self, piece, offset_x=0, offset_y=0):
+        self.screen.blits(self.piece_tiles(piece, offset_x, offset_y), doreturn=False)
 
+    def ghost_y(self):
+        return self.engine.ghost_y()
 
-    def lock_piece(self, piece):
-        for x_offset, y_offset in piece['shape'][piece['rotation']]:
-            block_x = piece['x'] + x_offset
-            block_y = piece['y'] + y_offset
-            if 0 <= block_x < GRID_WIDTH and 0 <= block_y < GRID_HEIGHT:
-                self.grid[block_y][block_x] = piece['color']
-
-        self.sound_drop.play()
-        self.check_lines()
-
-        # Generate new piece
-        self.current_piece = self.next_piece
-        self.next_piece = self.new_piece()
-
-        # Game over condition: new piece can't be placed
-        if not self.valid_position(self.current_piece):
-            self.game_over = True
-            self.sound_gameover.play()
-            # REMOVED: mixer.music.stop() # No background music to stop
-
-    def check_lines(self):
-        lines_to_clear = []
-        for y in range(GRID_HEIGHT):
-            if all(self.grid[y][x] != '' for x in range(GRID_WIDTH)):
-                lines_to_clear.append(y)
-
-        if lines_to_clear:
-            self.sound_clear.play()
-            num_cleared = len(lines_to_clear)
-            self.score += self.calculate_score(num_cleared)
-            self.lines_cleared += num_cleared
-            self.update_level()
-            self.create_line_clear_particles(lines_to_clear)
-
-            # Remove cleared lines and shift lines down
-            for line_y in sorted(lines_to_clear, reverse=True):
-                self.grid.pop(line_y)
-                self.grid.insert(0, ['' for _ in range(GRID_WIDTH)])
-
-    def calculate_score(self, num_lines):
-        # Classic Tetris scoring
-        if num_lines == 1:
-            return 100 * self.level
-        elif num_lines == 2:
-            return 300 * self.level
-        elif num_lines == 3:
-            return 500 * self.level
-        elif num_lines == 4: # Tetris!
-            return 800 * self.level
-        return 0
-
-    def update_level(self):
-        new_level = 1 + (self.lines_cleared // 10)
-        if new_level > self.level:
-            self.level = new_level
-            self.drop_speed = max(50, 1000 - (self.level - 1) * 70) # Increase speed, min 50ms
-
-    def hard_drop(self):
-        while self.valid_position(self.current_piece, y_offset=1):
-            self.current_piece['y'] += 1
-            self.score += 2 # Score for each cell hard dropped
-
-        self.lock_piece(self.current_piece)
-        self.sound_drop.play()
+    def valid_position(self, piece, x_offset=0, y_offset=0, rotation_offset=0):
+        return self.engine.valid_position(piece, x_offset, y_offset, rotation_offset)
 
     def reset_game(self):
         # Save score if it's a high score
+        if not self.high_scores_loaded:
+            self.reload_high_scores()
         self.save_high_score(self.score)
 
-        self.grid = self.create_empty_grid()
-        self.current_piece = self.new_piece()
-        self.next_piece = self.new_piece()
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-        self.drop_speed = 1000
-        self.last_drop_time = time.time() * 1000
-        self.game_over = False
-        self.paused = False
+        self.engine.apply_action(ACTION_RESTART)
+        self.input.clear()
         self.show_high_scores = False
-        self.high_scores = self.load_high_scores() # Reload high scores in case of new entry
+        self.game_started = time.time()
         # REMOVED: mixer.music.play(-1) # No background music to restart
 
+    def build_controls_panel(self):
+        # The control hints never change, so they are composed into one surface up front
+        lines = [(self.small_font.render(text, True, WHITE), y) for text, y in CONTROL_HINTS]
+        width = max(line.get_width() for line, _ in lines)
+        height = max(y + line.get_height() for line, y in lines)
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        for line, y in lines:
+            panel.blit(line, (0, y))
+        return panel
+
+    def text(self, font, text, color):
+        return self.text_cache.render(font, text, color)
+
+    def blit_centered(self, surface, y):
+        self.screen.blit(surface, (SCREEN_WIDTH // 2 - surface.get_width() // 2, y))
+
     def draw_next_piece(self):
-        next_text = self.font.render("NEXT", True, WHITE)
-        self.screen.blit(next_text, (GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + 50, GRID_OFFSET_Y))
+        if self.fonts_ready:
+            next_text = self.text(self.font, "NEXT", WHITE)
+            self.screen.blit(next_text, self.next_piece_rect.topleft)
 
-        # Draw next piece centered in a smaller area
-        next_piece_display_x = GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + 50
-        next_piece_display_y = GRID_OFFSET_Y + 40
+        # Draw next piece centered in a smaller area, two columns in as on the default board
+        next_piece_display_x = self.next_piece_rect.x - (self.next_piece['x'] - 2) * self.block_size
+        next_piece_display_y = self.next_piece_rect.y + 40
         self.draw_piece(self.next_piece, next_piece_display_x, next_piece_display_y)
 
-    def draw_ui(self):
-        score_text = self.font.render(f"SCORE: {self.score}", True, WHITE)
-        level_text = self.font.render(f"LEVEL: {self.level}", True, WHITE)
-        lines_text = self.font.render(f"LINES: {self.lines_cleared}", True, WHITE)
+    def refresh_hud(self):
+        # The HUD shows a snapshot that is refreshed every frame, or less often under load
+        now = now_ms()
+        if self.hud_values is None or now - self.hud_refreshed >= self.governor.quality['hud_interval_ms']:
+            ai_stats = self.bot.stats() if self.ai_enabled else None
+            self.hud_values = (self.score, self.level, self.lines_cleared, ai_stats)
+            self.hud_refreshed = now
 
-        self.screen.blit(score_text, (20, 20))
-        self.screen.blit(level_text, (20, 60))
-        self.screen.blit(lines_text, (20, 100))
+    def draw_ui(self):
+        if not self.fonts_ready:
+            return
+        score, level, lines, stats = self.hud_values
+        self.screen.blit(self.text(self.font, f"SCORE: {score}", WHITE), (20, 20))
+        self.screen.blit(self.text(self.font, f"LEVEL: {level}", WHITE), (20, 60))
+        self.screen.blit(self.text(self.font, f"LINES: {lines}", WHITE), (20, 100))
 
         # Controls Hint
-        controls_text = self.small_font.render("Controls:", True, WHITE)
-        left_right_text = self.small_font.render("Left/Right Arrows: Move", True, WHITE)
-        down_text = self.small_font.render("Down Arrow: Soft Drop", True, WHITE)
-        up_z_text = self.small_font.render("Up/Z: Rotate", True, WHITE)
-        space_text = self.small_font.render("Space: Hard Drop", True, WHITE)
-        p_text = self.small_font.render("P: Pause", True, WHITE)
-        r_text = self.small_font.render("R: Restart (Game Over/Paused)", True, WHITE)
-        h_text = self.small_font.render("H: High Scores (Game Over)", True, WHITE)
-
-        self.screen.blit(controls_text, (SCREEN_WIDTH - 200, 20))
-        self.screen.blit(left_right_text, (SCREEN_WIDTH - 200, 50))
-        self.screen.blit(down_text, (SCREEN_WIDTH - 200, 70))
-        self.screen.blit(up_z_text, (SCREEN_WIDTH - 200, 90))
-        self.screen.blit(space_text, (SCREEN_WIDTH - 200, 110))
-        self.screen.blit(p_text, (SCREEN_WIDTH - 200, 130))
-        self.screen.blit(r_text, (SCREEN_WIDTH - 200, 150))
-        self.screen.blit(h_text, (SCREEN_WIDTH - 200, 170))
+        self.screen.blit(self.controls_panel, (SCREEN_WIDTH - 200, 20))
+
+        if stats is not None:
+            ai_text = self.text(
+                self.small_font,
+                f"AI: {stats['nodes_per_second']:,.0f} nodes/s, cache {stats['cache_hit_rate']:.0%}",
+                LIGHT_GRAY)
+            self.screen.blit(ai_text, (20, 140))
 
     def load_high_scores(self):
-        if os.path.exists(SCORE_FILE):
-            with open(SCORE_FILE, 'r') as f:
-                return json.load(f)
-        return []
+        if self.score_store is None:
+            self.score_store = ScoreStore(self.score_db)
+        return [(row['score'], row['player'], row['lines'])
+                for row in self.score_store.top(HIGH_SCORE_ROWS)]
 
     def save_high_score(self, new_score):
         if new_score > 0:
-            self.high_scores.append(new_score)
-            self.high_scores = sorted(self.high_scores, reverse=True)[:5] # Keep top 5
-            with open(SCORE_FILE, 'w') as f:
-                json.dump(self.high_scores, f)
+            # The store writes in the background; the cached table is updated here
+            self.score_store.add(new_score, self.player, self.lines_cleared, self.level,
+                                 self.engine.pieces_placed, duration=time.time() - self.game_started)
+            entry = (new_score, self.player, self.lines_cleared)
+            self.high_scores = sorted(self.high_scores + [entry], key=lambda e: e[0],
+                                      reverse=True)[:HIGH_SCORE_ROWS]
+
+    def draw_modal_overlay(self):
+        # A full-screen alpha blend, the first thing dropped under load after particles
+        if self.governor.quality['overlays']:
+            self.screen.blit(self.modal_overlay, (0, 0))
 
     def draw_high_scores(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Semi-transparent black
-        self.screen.blit(overlay, (0, 0))
+        self.draw_modal_overlay()
 
-        title_text = self.big_font.render("HIGH SCORES", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 100))
+        self.blit_centered(self.text(self.big_font, "HIGH SCORES", WHITE), 100)
 
         y_offset = 200
         if not self.high_scores:
-            no_scores_text = self.font.render("No high scores yet!", True, LIGHT_GRAY)
-            self.screen.blit(no_scores_text, (SCREEN_WIDTH // 2 - no_scores_text.get_width() // 2, y_offset))
+            self.blit_centered(self.text(self.font, "No high scores yet!", LIGHT_GRAY), y_offset)
         else:
-            for i, score in enumerate(self.high_scores):
-                score_display = self.font.render(f"{i + 1}. {score}", True, WHITE)
-                self.screen.blit(score_display, (SCREEN_WIDTH // 2 - score_display.get_width() // 2, y_offset + i * 40))
+            for i, (score, player, lines) in enumerate(self.high_scores):
+                line = f"{i + 1}. {score}"
+                if player:
+                    line += f"  {player}"
+                if lines is not None:
+                    line += f"  ({lines} lines)"
+                self.blit_centered(self.text(self.font, line, WHITE), y_offset + i * 40)
 
-        back_text = self.font.render("Press H to go back", True, LIGHT_GRAY)
-        self.screen.blit(back_text, (SCREEN_WIDTH // 2 - back_text.get_width() // 2, SCREEN_HEIGHT - 50))
+        self.blit_centered(self.text(self.font, "Press H to go back", LIGHT_GRAY), SCREEN_HEIGHT - 50)
 
 
     def draw_game_over(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Semi-transparent black
-        self.screen.blit(overlay, (0, 0))
-
-        game_over_text = self.big_font.render("GAME OVER", True, RED)
-        final_score_text = self.font.render(f"Final Score: {self.score}", True, WHITE)
-        restart_text = self.font.render("Press R to Restart", True, LIGHT_GRAY)
-        high_scores_text = self.font.render("Press H for High Scores", True, LIGHT_GRAY)
-
-        self.screen.blit(game_over_text,
-                         (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 - 100))
-        self.screen.blit(final_score_text,
-                         (SCREEN_WIDTH // 2 - final_score_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 - 20))
-        self.screen.blit(restart_text,
-                         (SCREEN_WIDTH // 2 - restart_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 + 30))
-        self.screen.blit(high_scores_text,
-                         (SCREEN_WIDTH // 2 - high_scores_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 + 70))
+        self.draw_modal_overlay()
+
+        self.blit_centered(self.text(self.big_font, "GAME OVER", RED), SCREEN_HEIGHT // 2 - 100)
+        self.blit_centered(self.text(self.font, f"Final Score: {self.score}", WHITE), SCREEN_HEIGHT // 2 - 20)
+        self.blit_centered(self.text(self.font, "Press R to Restart", LIGHT_GRAY), SCREEN_HEIGHT // 2 + 30)
+        self.blit_centered(self.text(self.font, "Press H for High Scores", LIGHT_GRAY), SCREEN_HEIGHT // 2 + 70)
 
     def draw_pause(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Semi-transparent black
-        self.screen.blit(overlay, (0, 0))
-
-        paused_text = self.big_font.render("PAUSED", True, WHITE)
-        continue_text = self.font.render("Press P to Continue", True, LIGHT_GRAY)
-        restart_text = self.font.render("Press R to Restart", True, LIGHT_GRAY)
-
-        self.screen.blit(paused_text,
-                         (SCREEN_WIDTH // 2 - paused_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(continue_text,
-                         (SCREEN_WIDTH // 2 - continue_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 - 10))
-        self.screen.blit(restart_text,
-                         (SCREEN_WIDTH // 2 - restart_text.get_width() // 2,
-                          SCREEN_HEIGHT // 2 + 30))
-
-    def create_line_clear_particles(self, cleared_lines):
-        for y in cleared_lines:
-            for x in range(GRID_WIDTH):
-                color = self.grid[y][x]
+        self.draw_modal_overlay()
+
+        self.blit_centered(self.text(self.big_font, "PAUSED", WHITE), SCREEN_HEIGHT // 2 - 50)
+        self.blit_centered(self.text(self.font, "Press P to Continue", LIGHT_GRAY), SCREEN_HEIGHT // 2 - 10)
+        self.blit_centered(self.text(self.font, "Press R to Restart", LIGHT_GRAY), SCREEN_HEIGHT // 2 + 30)
+
+    def create_line_clear_particles(self, cleared_rows):
+        # cleared_rows holds (y, row colors) captured before the rows were removed
+        limit = self.governor.quality['particles']
+        if limit == 0:
+            return
+        centers_x, centers_y, colors = [], [], []
+        size = self.block_size
+        for y, row in cleared_rows:
+            if not self.view_top <= y < self.view_top + self.view_rows:
+                continue
+            for x, color in enumerate(row):
                 if color:
-                    center_x = GRID_OFFSET_X + x * BLOCK_SIZE + BLOCK_SIZE // 2
-                    center_y = GRID_OFFSET_Y + y * BLOCK_SIZE + BLOCK_SIZE // 2
-                    for _ in range(5): # Create 5 particles per cleared block
-                        self.particles.append(Particle(center_x, center_y, color))
+                    centers_x.append(self.grid_offset_x + x * size + size // 2)
+                    centers_y.append(self.grid_offset_y + (y - self.view_top) * size + size // 2)
+                    colors.append(COLOR_INDEX[color])
+        self.particles.emit(centers_x, centers_y, colors, PARTICLES_PER_BLOCK, limit)
+
+    def update_particles(self):
+        self.particles.update()
 
     def draw_particles(self):
-        for particle in self.particles:
-            particle.update()
-            particle.draw(self.screen)
-        self.particles = [p for p in self.particles if p.is_alive()]
+        self.particles.draw(self.screen)
+
+    def particles_bounding_rect(self):
+        return self.particles.bounding_rect()
 
     def handle_events(self):
-        for event in pygame.event.get():
+        # Gameplay keys are queued with their timestamps and applied by the
+        # simulation; menu keys take effect straight away
+        press = self.input.press
+        for time_ms, event in self.input.take_events():
             if event.type == pygame.QUIT:
                 return False
 
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_redraw = True
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler:
+                self.profiler.toggle_hud()
+                self.full_redraw = True
+
+            if event.type == pygame.KEYUP and event.key in HELD_KEYS:
+                self.input.release(time_ms, HELD_KEYS[event.key])
+
             if event.type == pygame.KEYDOWN:
                 if self.show_high_scores:
                     if event.key == pygame.K_h:
@@ -511,80 +595,256 @@ class Tetris:
                         self.reset_game()
                     elif event.key == pygame.K_h:
                         self.show_high_scores = True
+                        self.input.clear()
                 elif self.paused:
                     if event.key == pygame.K_p:
-                        self.paused = False
+                        press(time_ms, ACTION_PAUSE)
                     elif event.key == pygame.K_r:
                         self.reset_game()
                 else:
-                    if event.key == pygame.K_LEFT:
-                        if self.valid_position(self.current_piece, x_offset=-1):
-                            self.current_piece['x'] -= 1
-                            self.sound_move.play()
-                    elif event.key == pygame.K_RIGHT:
-                        if self.valid_position(self.current_piece, x_offset=1):
-                            self.current_piece['x'] += 1
-                            self.sound_move.play()
-                    elif event.key == pygame.K_DOWN:
-                        if self.valid_position(self.current_piece, y_offset=1):
-                            self.current_piece['y'] += 1
-                    elif event.key == pygame.K_UP or event.key == pygame.K_z:
-                        self.rotate_piece()
+                    if event.key in HELD_KEYS:
+                        press(time_ms, HELD_KEYS[event.key])
+                    elif event.key == pygame.K_UP or event.key == pygame.K_x:
+                        press(time_ms, ACTION_ROTATE)
+                    elif event.key == pygame.K_z:
+                        press(time_ms, ACTION_ROTATE_CCW)
+                    elif event.key == pygame.K_c:
+                        press(time_ms, ACTION_ROTATE_180)
                     elif event.key == pygame.K_SPACE:
-                        self.hard_drop()
+                        press(time_ms, ACTION_HARD_DROP)
                     elif event.key == pygame.K_p:
-                        self.paused = True
+                        press(time_ms, ACTION_PAUSE)
                     elif event.key == pygame.K_r:
                         self.reset_game()
                     elif event.key == pygame.K_h:
                         self.show_high_scores = True
+                        self.input.clear()
+                    elif event.key == pygame.K_a:
+                        self.ai_enabled = not self.ai_enabled
 
         return True
 
+    def apply_input(self, action, event_time):
+        self.engine.apply_action(action)
+        if event_time is not None:
+            self.input.applied(event_time)
+
+    def input_deadline(self):
+        # Real time at the end of the current simulation step
+        if self.sim_lag is None:
+            return now_ms()
+        return self.sim_time + self.sim_lag
+
+    def sim_clock(self):
+        return self.sim_time
+
     def update(self):
-        if self.game_over or self.paused or self.show_high_scores:
+        # One fixed simulation step of step_ms
+        piece = self.current_piece
+        self.previous_piece = (piece, piece['x'], piece['y'], piece['rotation'])
+        self.sim_time += self.step_ms
+        self.update_particles()
+        if self.show_high_scores:
             return
 
-        # Auto drop
-        current_time = time.time() * 1000
-        if current_time - self.last_drop_time > self.drop_speed:
-            if self.valid_position(self.current_piece, y_offset=1):
-                self.current_piece['y'] += 1
-            else:
-                self.lock_piece(self.current_piece)
+        self.input.advance(self.input_deadline(), self.apply_input)
+        if self.ai_enabled and not self.game_over and not self.paused:
+            self.engine.apply_action(self.bot.next_action(self.engine))
+        self.engine.update()
+
+    def interpolated_offset(self, alpha):
+        # Pixels to draw the falling piece back towards where it was one step ago
+        if self.previous_piece is None:
+            return 0
+        piece, x, y, rotation = self.previous_piece
+        current = self.current_piece
+        if piece is not current or x != current['x'] or rotation != current['rotation']:
+            return 0
+        return -round((1 - alpha) * (current['y'] - y) * self.block_size)
+
+    def draw(self, alpha=1.0):
+        # alpha is how far the frame lies between the last simulation step and the next
+        self.render_offset = self.interpolated_offset(alpha) if self.interpolate else 0
+        self.scroll_to_piece()
+        self.refresh_hud()
+        if self.dirty_rects:
+            self.draw_dirty()
+        else:
+            self.draw_scene()
 
-            self.last_drop_time = current_time
+            # Update the display
+            self.present()
+        self.input.presented()
 
-    def draw(self):
+    def present(self, rects=None):
+        start = now_ms()
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.present_ms = now_ms() - start
+
+    def draw_scene(self):
         # Clear the screen
         self.screen.fill(BG_COLOR)
 
         # Draw the game elements
-        self.draw_grid()
-        self.draw_ghost_piece()
-        self.draw_piece(self.current_piece, GRID_OFFSET_X, GRID_OFFSET_Y)
+        self.draw_board()
         self.draw_next_piece()
         self.draw_ui()
         self.draw_particles()
 
         # Draw game over, pause, or high scores screen if needed
-        if self.game_over:
-            self.draw_game_over()
-        elif self.paused:
-            self.draw_pause()
-        elif self.show_high_scores:
-            self.draw_high_scores()
+        if self.fonts_ready:
+            if self.game_over:
+                self.draw_game_over()
+            elif self.paused:
+                self.draw_pause()
+            elif self.show_high_scores:
+                self.draw_high_scores()
+
+        if self.profiler and self.profiler.hud_visible:
+            self.profiler.draw_hud(self.screen)
+
+    def piece_rect(self, piece, y=None, dy=0):
+        # Screen rect covering a piece on the board, optionally at another row or pixel offset
+        y = piece['y'] if y is None else y
+        cells = piece['shape'][piece['rotation']]
+        xs = [piece['x'] + cx for cx, _ in cells]
+        ys = [y + cy for _, cy in cells]
+        size = self.block_size
+        return pygame.Rect(self.grid_offset_x + min(xs) * size,
+                           self.grid_offset_y + (min(ys) - self.view_top) * size + dy,
+                           (max(xs) - min(xs) + 1) * size,
+                           (max(ys) - min(ys) + 1) * size).clip(self.board_rect)
+
+    def frame_state(self):
+        piece = self.current_piece
+        return {
+            'board': (self.engine.board_version, self.view_top),
+            'piece': (piece['name'], piece['x'], piece['y'], piece['rotation'], self.render_offset),
+            'piece_rects': (self.piece_rect(piece, dy=self.render_offset),
+                            self.piece_rect(piece, self.ghost_y())),
+            'next': self.next_piece['name'],
+            'hud': self.hud_values,
+            'overlay': (self.game_over, self.paused, self.show_high_scores,
+                        tuple(self.high_scores), self.governor.level),
+        }
 
-        # Update the display
-        pygame.display.flip()
+    def collect_dirty_rects(self, state):
+        last = self.last_frame_state
+        last_particle_rect = self.particle_rect
+        self.particle_rect = self.particles_bounding_rect()
+        if self.full_redraw or last is None or state['overlay'] != last['overlay']:
+            self.full_redraw = False
+            return [self.screen.get_rect()]
+
+        rects = []
+        if state['board'] != last['board']:
+            rects.append(self.board_rect)
+        elif state['piece'] != last['piece']:
+            rects.extend(last['piece_rects'])
+            rects.extend(state['piece_rects'])
+        if state['next'] != last['next']:
+            rects.append(self.next_piece_rect)
+        if state['hud'] != last['hud']:
+            rects.append(self.hud_rect)
+
+        # Particles need both their old and new footprint repainted
+        for rect in (last_particle_rect, self.particle_rect):
+            if rect is not None:
+                rects.append(rect)
+        if self.profiler and self.profiler.hud_visible and self.profiler.hud_rect():
+            rects.append(self.profiler.hud_rect())
+        return rects
+
+    def draw_dirty(self):
+        state = self.frame_state()
+        rects = self.collect_dirty_rects(state)
+        self.last_frame_state = state
+        if not rects:
+            return  # Nothing changed: skip drawing and presenting entirely
+
+        # Redraw the scene clipped to the changed area, then present only those rects
+        self.screen.set_clip(rects[0].unionall(rects[1:]))
+        self.draw_scene()
+        self.screen.set_clip(None)
+        self.present(rects)
+
+    def end_frame_work(self):
+        # Frame time up to here is work; under vsync the flip also waited for the display
+        if self.startup_tasks:
+            return  # Loading frames say nothing about steady-state cost
+        work = now_ms() - self.frame_start
+        if self.render_mode == 'vsync':
+            work -= self.present_ms
+        self.governor.end_frame(work)
+
+    def wait_for_next_frame(self):
+        if self.render_mode == 'capped':
+            # Sleep in short slices until the frame is due, polling input so
+            # events get timestamps finer than a frame
+            deadline = self.frame_start + 1000 / self.fps
+            while now_ms() < deadline - 1:
+                self.input.poll()
+                time.sleep(0.001)
+        # vsync already waited in flip; uncapped never waits
+        self.clock.tick()
 
     def run(self):
+        # Fixed-timestep loop: real time accumulates and is consumed in whole
+        # simulation steps, so gameplay speed doesn't depend on the frame rate
         running = True
+        accumulator = 0.0
+        previous = now_ms()
         while running:
+            now = self.frame_start = now_ms()
+            accumulator += min(now - previous, MAX_FRAME_MS)
+            previous = now
+            self.sim_lag = now - (self.sim_time + accumulator)
+
             running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(60)  # 60 FPS
+            while accumulator >= self.step_ms:
+                self.update()
+                accumulator -= self.step_ms
+            # Input from within the step in progress can't be reordered against
+            # gravity any more, so apply it now instead of a step later
+            if not self.show_high_scores:
+                self.input.advance(now, self.apply_input)
+            self.process_engine_events()
+            self.draw(accumulator / self.step_ms)
+            self.run_startup_task()
+            self.end_frame_work()
+            self.wait_for_next_frame()
+            if self.profiler:
+                self.profiler.end_frame()
+
+        if self.record_path:
+            self.replay_recorder.save(self.record_path, self.engine)
+        if self.dataset_recorder:
+            self.dataset_recorder.close()
+        if self.suspend_path:
+            if self.game_over:
+                if os.path.exists(self.suspend_path):
+                    os.remove(self.suspend_path)  # Nothing left to resume
+            else:
+                save_file(self.suspend_path, self.engine)
+        if self.score_store:
+            self.score_store.close()  # Waits for queued scores to be written
+        if self.profiler:
+            self.profiler.export(self.profile_path)
+        if self.latency_report:
+            for name, stats in self.input.latency_stats().items():
+                print(f"{name:17} p50 {stats['p50']:6.2f} ms  p95 {stats['p95']:6.2f} ms  "
+                      f"max {stats['max']:6.2f} ms  ({stats['count']} inputs)")
+        if self.quality_report:
+            stats = self.governor.stats()
+            budget = '' if stats['budget_ms'] is None else f" of {stats['budget_ms']:.1f} ms"
+            print(f"quality {stats['level']} ({stats['name']}), frame work p50 {stats['p50']:.2f} ms  "
+                  f"p95 {stats['p95']:.2f} ms  max {stats['max']:.2f} ms{budget}, "
+                  f"{stats['step_downs']} step(s) down, {stats['step_ups']} up")
+            print("frames per level: " + ", ".join(f"{level['name']} {count}" for level, count
+                                                   in zip(QUALITY_LEVELS, stats['frames_at_level'])))
 
         # Clean up before quitting
         # mixer.music.stop() # No background music to stop
@@ -619,7 +879,217 @@ class Particle:
     def is_alive(self):
         return self.alpha > 0 and self.size > 0
 
+
+class ParticleList:
+    """Particle objects in a list; used when NumPy is not installed."""
+
+    def __init__(self, max_particles=MAX_PARTICLES):
+        self.max_particles = max_particles
+        self.particles = []
+
+    def __len__(self):
+        return len(self.particles)
+
+    def emit(self, xs, ys, colors, per_point, limit=None):
+        if limit is not None and xs:
+            # Fewer particles per point first, so a capped burst still covers every block
+            per_point = min(per_point, max(1, limit // len(xs)))
+            xs, ys, colors = xs[:limit], ys[:limit], colors[:limit]
+        for x, y, color in zip(xs, ys, colors):
+            for _ in range(per_point):
+                self.particles.append(Particle(x, y, PALETTE[color]))
+        # Drop the oldest particles beyond the cap
+        del self.particles[:-self.max_particles]
+
+    def update(self):
+        for particle in self.particles:
+            particle.update()
+        self.particles = [p for p in self.particles if p.is_alive()]
+
+    def draw(self, screen):
+        for particle in self.particles:
+            particle.draw(screen)
+
+    def bounding_rect(self):
+        if not self.particles:
+            return None
+        rects = [pygame.Rect(p.x - p.size, p.y - p.size, p.size * 2 + 2, p.size * 2 + 2)
+                 for p in self.particles]
+        return rects[0].unionall(rects[1:])
+
+
+# Particle sprites are quantized to whole-pixel radii and this many alpha levels
+PARTICLE_MAX_RADIUS = 5
+PARTICLE_ALPHA_LEVELS = 16
+
+
+def build_particle_atlas():
+    """
+    Pre-render one circle sprite per (color id, radius, alpha level), stored
+    flat at index (color * (PARTICLE_MAX_RADIUS + 1) + radius) * PARTICLE_ALPHA_LEVELS + level.
+    """
+    atlas = []
+    for color in PALETTE:
+        for radius in range(PARTICLE_MAX_RADIUS + 1):
+            for level in range(PARTICLE_ALPHA_LEVELS):
+                sprite = pygame.Surface((max(1, radius * 2), max(1, radius * 2)), pygame.SRCALPHA)
+                if color and radius:
+                    alpha = 255 * (level + 1) // PARTICLE_ALPHA_LEVELS
+                    pygame.draw.circle(sprite, color + (alpha,), (radius, radius), radius)
+                atlas.append(sprite)
+    return atlas
+
+
+class ParticleSystem:
+    """
+    Fixed-capacity particle engine backed by NumPy arrays.
+
+    Position, velocity, alpha, size and decay live in preallocated arrays and
+    are advanced in one vectorized step. New particles are written at a ring
+    cursor, so once the cap is reached the oldest (normally long dead) slots
+    are reused. Drawing is a single Surface.blits call over atlas sprites.
+    """
+
+    def __init__(self, max_particles=MAX_PARTICLES):
+        self.max_particles = max_particles
+        self.rng = np.random.default_rng()
+        self.x = np.zeros(max_particles, dtype=np.float32)
+        self.y = np.zeros(max_particles, dtype=np.float32)
+        self.velocity_x = np.zeros(max_particles, dtype=np.float32)
+        self.velocity_y = np.zeros(max_particles, dtype=np.float32)
+        self.alpha = np.zeros(max_particles, dtype=np.float32)
+        self.size = np.zeros(max_particles, dtype=np.float32)
+        self.decay_rate = np.zeros(max_particles, dtype=np.float32)
+        self.color = np.zeros(max_particles, dtype=np.int64)
+        self.alive = np.zeros(max_particles, dtype=bool)
+        self.cursor = 0
+        self.atlas = None  # Built on first draw to keep startup fast
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def emit(self, xs, ys, colors, per_point, limit=None):
+        count = len(xs) * per_point
+        if not count:
+            return
+        if limit is not None:
+            # Fewer particles per point first, so a capped burst still covers every block
+            per_point = min(per_point, max(1, limit // len(xs)))
+            count = min(len(xs) * per_point, limit)
+        count = min(count, self.max_particles)
+        slots = (self.cursor + np.arange(count)) % self.max_particles
+        self.cursor = int((self.cursor + count) % self.max_particles)
+
+        self.x[slots] = np.repeat(np.asarray(xs, dtype=np.float32), per_point)[:count]
+        self.y[slots] = np.repeat(np.asarray(ys, dtype=np.float32), per_point)[:count]
+        self.color[slots] = np.repeat(np.asarray(colors), per_point)[:count]
+        self.size[slots] = self.rng.integers(2, 6, count)
+        self.velocity_x[slots] = self.rng.uniform(-2, 2, count)
+        self.velocity_y[slots] = self.rng.uniform(-4, -1, count)
+        self.alpha[slots] = 255
+        self.decay_rate[slots] = self.rng.integers(5, 16, count)
+        self.alive[slots] = True
+
+    def update(self):
+        if not self.alive.any():
+            return
+        self.x += self.velocity_x
+        self.y += self.velocity_y
+        self.velocity_y += 0.1 # Gravity
+        np.maximum(self.alpha - self.decay_rate, 0, out=self.alpha)
+        np.maximum(self.size - 0.05, 0, out=self.size) # Shrink
+        self.alive &= (self.alpha > 0) & (self.size > 0)
+
+    def draw(self, screen):
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        radius = self.size[live].astype(np.int64)
+        level = np.minimum(self.alpha[live].astype(np.int64) * PARTICLE_ALPHA_LEVELS // 256,
+                           PARTICLE_ALPHA_LEVELS - 1)
+        sprite = (self.color[live] * (PARTICLE_MAX_RADIUS + 1) + radius) * PARTICLE_ALPHA_LEVELS + level
+        if self.atlas is None:
+            self.atlas = build_particle_atlas()
+        left = (self.x[live] - radius).tolist()
+        top = (self.y[live] - radius).tolist()
+        atlas = self.atlas
+        screen.blits([(atlas[i], (lx, ty)) for i, lx, ty in zip(sprite.tolist(), left, top)],
+                     doreturn=False)
+
+    def bounding_rect(self):
+        live = self.alive
+        if not live.any():
+            return None
+        size = self.size[live]
+        left = float((self.x[live] - size).min())
+        top = float((self.y[live] - size).min())
+        right = float((self.x[live] + size).max())
+        bottom = float((self.y[live] + size).max())
+        return pygame.Rect(int(left) - 1, int(top) - 1, int(right - left) + 3, int(bottom - top) + 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="redraw and present only the screen regions that changed")
+    parser.add_argument('--max-particles', type=int, default=MAX_PARTICLES,
+                        help="hard cap on live line-clear particles")
+    parser.add_argument('--sound-cache', metavar='DIR',
+                        help="keep synthesized sound effects in this directory")
+    parser.add_argument('--fast-startup', action='store_true',
+                        help="show the first frame before loading fonts, sounds and scores")
+    parser.add_argument('--no-audio', action='store_true', help="never initialise the mixer")
+    parser.add_argument('--low-latency-audio', dest='audio_buffer', action='store_const',
+                        const=LOW_LATENCY_BUFFER, default=AUDIO_BUFFER,
+                        help=f"use a {LOW_LATENCY_BUFFER}-sample mixer buffer so sounds follow input closely")
+    parser.add_argument('--audio-buffer', type=int, dest='audio_buffer', metavar='SAMPLES',
+                        help=f"mixer buffer size in samples (default {AUDIO_BUFFER})")
+    parser.add_argument('--seed', type=int, help="seed for the piece sequence")
+    # A replay has to start from a fresh game, so it can't be combined with resuming one
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument('--record', metavar='FILE', help="save a replay of the session on exit")
+    session.add_argument('--suspend', metavar='FILE',
+                         help="save the game to FILE on exit and resume it from there on the next run")
+    parser.add_argument('--render', choices=RENDER_MODES, default='capped',
+                        help="frame pacing: capped at --fps, synced to the display, or uncapped")
+    parser.add_argument('--fps', type=int, default=60, help="frame cap for --render capped")
+    parser.add_argument('--interpolate', action='store_true',
+                        help="smooth the falling piece between simulation steps")
+    parser.add_argument('--sim-rate', type=int, default=SIM_RATE, help="simulation steps per second")
+    parser.add_argument('--das', type=int, default=DAS_MS,
+                        help="delay in ms before a held left/right/down key repeats")
+    parser.add_argument('--arr', type=int, default=ARR_MS, help="ms between repeats of a held key")
+    parser.add_argument('--input-latency', action='store_true',
+                        help="print input latency percentiles on exit")
+    parser.add_argument('--player', help="name saved with your scores (default: login name)")
+    parser.add_argument('--profile', metavar='PREFIX', nargs='?', const='frame_profile',
+                        help="time each frame phase (F3 shows the HUD) and write PREFIX.json "
+                             "(Chrome trace) and PREFIX.csv on exit")
+    parser.add_argument('--quality', type=int, choices=range(len(QUALITY_LEVELS)),
+                        help="pin the effects quality level (0 full .. 4) instead of adapting it to load")
+    parser.add_argument('--quality-report', action='store_true',
+                        help="print the quality level and frame work times on exit")
+    parser.add_argument('--dataset', metavar='DIR',
+                        help="append (state, action, reward) transitions to a training dataset")
+    parser.add_argument('--width', type=int, default=GRID_WIDTH, help="board columns (up to 64)")
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT,
+                        help="board rows (up to 1000); tall boards scroll with the piece")
+    parser.add_argument('--block-size', type=int,
+                        help="cell size in pixels (default: the largest that fits)")
+    args = parser.parse_args(argv)
+
+    game = Tetris(dirty_rects=args.dirty_rects, max_particles=args.max_particles,
+                  sound_cache_dir=args.sound_cache, fast_startup=args.fast_startup,
+                  audio=not args.no_audio, seed=args.seed, record=args.record,
+                  render_mode=args.render, fps=args.fps, interpolate=args.interpolate,
+                  sim_rate=args.sim_rate, das=args.das, arr=args.arr,
+                  latency_report=args.input_latency, profile=args.profile, player=args.player,
+                  width=args.width, height=args.height, block_size=args.block_size,
+                  suspend=args.suspend, audio_buffer=args.audio_buffer, dataset=args.dataset,
+                  quality=args.quality, quality_report=args.quality_report)
+    game.run()
+
+
 # Start the game
 if __name__ == "__main__":
-    game = Tetris()
-    game.run()
+    main()